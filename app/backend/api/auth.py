@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
-from extensions import db, jwt, limiter
+from extensions import db, jwt, limiter, passwords
 from models.user import User
 from flask_jwt_extended import create_access_token
-from passlib.hash import bcrypt
+from passwords import HasherBusy
 import re
 from sqlalchemy.exc import IntegrityError
 
@@ -27,7 +27,10 @@ def signup():
         return jsonify({'msg': 'Invalid email format'}), 400
 
     # Hash password
-    password_hash = bcrypt.hash(password)
+    try:
+        password_hash = passwords.hash(password)
+    except HasherBusy as e:
+        return jsonify({'msg': str(e)}), 503, {'Retry-After': '1'}
     user = User(username=username, email=email, password_hash=password_hash)
     try:
         db.session.add(user)
@@ -52,11 +55,17 @@ def login():
         print('  User.email:', user.email)
         print('  Password hash:', user.password_hash)
         try:
-            password_check = bcrypt.verify(password, user.password_hash)
+            password_check, new_hash = passwords.verify(password, user.password_hash)
+        except HasherBusy as e:
+            return jsonify({'msg': str(e)}), 503, {'Retry-After': '1'}
         except Exception as e:
             print('  Password check error:', e)
-            password_check = False
+            password_check, new_hash = False, None
         print('  Password check:', password_check)
+        if password_check and new_hash:
+            # Stored hash uses an old scheme or cost; replace it while we have the password
+            user.password_hash = new_hash
+            db.session.commit()
     else:
         password_check = False
     if not user or not password_check:
@@ -1,7 +1,150 @@
-from flask import Blueprint, request, jsonify
-from extensions import db
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime, timedelta
+import numpy as np
+from extensions import db, cache
 from models.post import Post
+from models.user import User
+from models.tag import post_tag
+from models.feed import Follow, TimelineEntry, FANOUT_LIMIT
+from user_cache import user_cache
+from api.posts import post_to_dict, encode_cursor, decode_cursor
+import ranking
 
 feed_bp = Blueprint('feed', __name__)
- 
-# Routes will be implemented here 
\ No newline at end of file
+
+MAX_PER_PAGE = 50
+
+# Ranked feed: score up to FEED_CANDIDATE_LIMIT recent public posts and keep the best per reader for a short while
+CANDIDATE_WINDOW = timedelta(days=7)
+TOP_FEED_SIZE = 200
+TOP_FEED_TTL = 60  # seconds
+
+def timeline_posts(user_id, cursor, limit):
+    """Posts fanned out into the reader's timeline, newest first."""
+    query = (db.session.query(Post, TimelineEntry.created_at)
+             .join(TimelineEntry, TimelineEntry.post_id == Post.id)
+             .filter(TimelineEntry.user_id == user_id))
+    if cursor:
+        created_at, post_id = cursor
+        query = query.filter(db.or_(
+            TimelineEntry.created_at < created_at,
+            db.and_(TimelineEntry.created_at == created_at, TimelineEntry.post_id < post_id)))
+    query = query.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc())
+    return [post for post, _ in query.limit(limit).all()]
+
+def high_fanout_posts(user_id, cursor, limit):
+    """Recent posts by followed authors that are not fanned out on write."""
+    authors = [row[0] for row in db.session.query(User.id)
+               .join(Follow, Follow.followee_id == User.id)
+               .filter(Follow.follower_id == user_id, User.follower_count > FANOUT_LIMIT).all()]
+    if not authors:
+        return []
+    query = Post.query.filter(Post.user_id.in_(authors), Post.visibility == 'public')
+    if cursor:
+        created_at, post_id = cursor
+        query = query.filter(db.or_(
+            Post.created_at < created_at,
+            db.and_(Post.created_at == created_at, Post.id < post_id)))
+    return query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit).all()
+
+@feed_bp.route('/api/feed', methods=['GET'])
+@jwt_required()
+def home_feed():
+    user_id = int(get_jwt_identity())
+    per_page = min(int(request.args.get('per_page', 10)), MAX_PER_PAGE)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor = decode_cursor(cursor, 'created_at')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    posts = timeline_posts(user_id, cursor, per_page + 1)
+    posts += high_fanout_posts(user_id, cursor, per_page + 1)
+    merged = {p.id: p for p in posts}
+    posts = sorted(merged.values(), key=lambda p: (p.created_at, p.id), reverse=True)
+
+    next_cursor = None
+    if len(posts) > per_page:
+        posts = posts[:per_page]
+        next_cursor = encode_cursor('created_at', posts[-1].created_at, posts[-1].id)
+    return jsonify({
+        'posts': [post_to_dict(p) for p in posts],
+        'per_page': per_page,
+        'next_cursor': next_cursor
+    })
+
+@feed_bp.route('/api/feed/follow/<int:user_id>', methods=['POST', 'DELETE'])
+@jwt_required()
+def follow(user_id):
+    follower_id = int(get_jwt_identity())
+    if user_id == follower_id:
+        return jsonify({'error': 'You cannot follow yourself'}), 400
+    if not user_cache.get(user_id):
+        return jsonify({'error': 'User not found'}), 404
+    existing = Follow.query.get((follower_id, user_id))
+    if request.method == 'POST' and not existing:
+        db.session.add(Follow(follower_id=follower_id, followee_id=user_id))
+        User.query.filter_by(id=user_id).update({User.follower_count: User.follower_count + 1})
+        TimelineEntry.backfill(follower_id, user_id)
+    elif request.method == 'DELETE' and existing:
+        db.session.delete(existing)
+        User.query.filter_by(id=user_id).update({User.follower_count: User.follower_count - 1})
+        TimelineEntry.unfollow(follower_id, user_id)
+    db.session.commit()
+    return jsonify({'following': request.method == 'POST'}), 200
+
+def load_top_feed(user_id):
+    """Score the candidate window for one reader and return the best post ids."""
+    now = datetime.utcnow()
+    since = now - CANDIDATE_WINDOW
+    window = db.and_(Post.visibility == 'public', Post.created_at >= since, Post.user_id != user_id)
+    limit = current_app.config.get('FEED_CANDIDATE_LIMIT', 5000)
+    newest = (Post.created_at.desc(), Post.id.desc())
+    rows = (db.session.query(Post.id, Post.user_id, Post.created_at,
+                             db.func.coalesce(Post.likes_count, 0), db.func.coalesce(Post.views_count, 0),
+                             Post.category)
+            .filter(window).order_by(*newest).limit(limit).all())
+    if not rows:
+        return []
+    ids, authors, created, likes, views, categories = (np.array(column) for column in zip(*rows))
+    age_hours = (np.datetime64(now, 's') - created.astype('datetime64[s]')).astype(np.float64) / 3600
+
+    # Reader affinity: who they follow, and the categories/tags they post in
+    own_posts = (db.session.query(Post.id, Post.category).filter(Post.user_id == user_id)
+                 .order_by(Post.created_at.desc()).limit(100).subquery())
+    reader_categories = [c for c, in db.session.query(own_posts.c.category).distinct() if c]
+    reader_tags = db.session.query(post_tag.c.tag_id).filter(post_tag.c.post_id.in_(db.select(own_posts.c.id))).distinct()
+    followed = [f for f, in db.session.query(Follow.followee_id).filter(Follow.follower_id == user_id)]
+    # Tag matches among the candidates only, not the whole window
+    candidates = db.select(Post.id).filter(window).order_by(*newest).limit(limit).subquery()
+    matched = [p for p, in db.session.query(post_tag.c.post_id)
+               .join(candidates, candidates.c.id == post_tag.c.post_id)
+               .filter(post_tag.c.tag_id.in_(reader_tags))]
+
+    scores = ranking.score(
+        likes.astype(np.float64),
+        views.astype(np.float64),
+        age_hours,
+        np.isin(categories, reader_categories).astype(np.float64),
+        ranking.count_matches(ids, np.array(matched, dtype=ids.dtype)),
+        np.isin(authors, followed).astype(np.float64),
+    )
+    return ranking.top_k(ids, scores, TOP_FEED_SIZE)
+
+@feed_bp.route('/api/feed/top', methods=['GET'])
+@jwt_required()
+def top_feed():
+    user_id = int(get_jwt_identity())
+    page = max(int(request.args.get('page', 1)), 1)
+    per_page = min(int(request.args.get('per_page', 10)), MAX_PER_PAGE)
+    ranked = cache.get_or_set(f'feed:top:{user_id}', lambda: load_top_feed(user_id), TOP_FEED_TTL)
+    page_ids = ranked[(page - 1) * per_page:page * per_page]
+    posts = {p.id: p for p in Post.query.filter(Post.id.in_(page_ids)).all()} if page_ids else {}
+    return jsonify({
+        'posts': [post_to_dict(posts[i]) for i in page_ids if i in posts],
+        'total': len(ranked),
+        'page': page,
+        'per_page': per_page
+    })
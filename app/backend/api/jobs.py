@@ -1,7 +1,113 @@
 from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from datetime import datetime
 from extensions import db
-from models.job import Job
+from models.job import Job, JobFacet
+from api.posts import encode_cursor, decode_cursor
+from search import apply_search
 
 jobs_bp = Blueprint('jobs', __name__)
- 
-# Routes will be implemented here 
\ No newline at end of file
+
+FACETS = ('company', 'location')
+FACET_LIMIT = 20
+MAX_PER_PAGE = 50
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'title': job.title,
+        'description': job.description,
+        'company': job.company,
+        'location': job.location,
+        'posted_at': job.posted_at.isoformat() if job.posted_at else None,
+    }
+
+def update_facets(job, delta):
+    for facet in FACETS:
+        value = getattr(job, facet)
+        if not value:
+            continue
+        if JobFacet.query.get((facet, value)) is None:
+            db.session.add(JobFacet(facet=facet, value=value, count=delta))
+        else:
+            JobFacet.query.filter_by(facet=facet, value=value).update(
+                {JobFacet.count: JobFacet.count + delta}, synchronize_session=False)
+
+def facet_counts(query=None):
+    """Top values per facet.
+
+    Unfiltered searches read the precomputed job_facet table. Filtered ones
+    group only the matching rows, which the filter has already narrowed
+    through an index.
+    """
+    facets = {}
+    for facet in FACETS:
+        if query is None:
+            rows = (db.session.query(JobFacet.value, JobFacet.count)
+                    .filter(JobFacet.facet == facet, JobFacet.count > 0)
+                    .order_by(JobFacet.count.desc()).limit(FACET_LIMIT).all())
+        else:
+            column = getattr(Job, facet)
+            count = db.func.count(Job.id)
+            rows = (query.order_by(None).with_entities(column, count)
+                    .filter(column.isnot(None))
+                    .group_by(column).order_by(count.desc()).limit(FACET_LIMIT).all())
+        facets[facet] = [{'value': value, 'count': n} for value, n in rows]
+    return facets
+
+@jobs_bp.route('/api/jobs', methods=['GET'])
+def search_jobs():
+    q = request.args.get('q', '').strip()
+    company = request.args.get('company')
+    location = request.args.get('location')
+    per_page = min(int(request.args.get('per_page', 20)), MAX_PER_PAGE)
+
+    query = Job.query
+    if q:
+        query, _ = apply_search(query, q, model=Job)
+    if company:
+        query = query.filter(Job.company == company)
+    if location:
+        query = query.filter(Job.location == location)
+    filtered = bool(q or company or location)
+
+    page = query
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            posted_at, job_id = decode_cursor(cursor, 'posted_at')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        page = page.filter(db.or_(
+            Job.posted_at < posted_at,
+            db.and_(Job.posted_at == posted_at, Job.id < job_id)))
+    jobs = page.order_by(Job.posted_at.desc(), Job.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(jobs) > per_page:
+        jobs = jobs[:per_page]
+        next_cursor = encode_cursor('posted_at', jobs[-1].posted_at, jobs[-1].id)
+    response = {
+        'jobs': [job_to_dict(j) for j in jobs],
+        'per_page': per_page,
+        'next_cursor': next_cursor
+    }
+    # Facets only come with the first page
+    if not cursor:
+        response['facets'] = facet_counts(query if filtered else None)
+    return jsonify(response)
+
+@jobs_bp.route('/api/jobs', methods=['POST'])
+@jwt_required()
+def create_job():
+    data = request.get_json() or {}
+    fields = {f: str(data.get(f, '')).strip() for f in ('title', 'description', 'company', 'location')}
+    if not fields['title'] or not fields['description'] or not fields['company']:
+        return jsonify({'error': 'title, description and company are required'}), 400
+    job = Job(title=fields['title'][:128], description=fields['description'], company=fields['company'][:128],
+              location=fields['location'][:128] or None, posted_at=datetime.utcnow())
+    db.session.add(job)
+    db.session.flush()
+    update_facets(job, 1)
+    db.session.commit()
+    return jsonify(job_to_dict(job)), 201
@@ -1,7 +1,197 @@
-from flask import Blueprint, request, jsonify
-from extensions import db
-from models.message import Message
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+import json
+from sqlalchemy.exc import IntegrityError
+from extensions import db, pubsub
+from pubsub import OVERFLOW, TooManyConnections
+from models.message import Message, Conversation, ConversationMember
+from models.user import User
+from user_cache import user_cache
+from api.posts import encode_cursor, decode_cursor
 
 messaging_bp = Blueprint('messaging', __name__)
- 
-# Routes will be implemented here 
\ No newline at end of file
+
+MAX_MESSAGE_LENGTH = 5000
+MAX_PER_PAGE = 100
+
+def message_to_dict(m):
+    return {
+        'id': m.id,
+        'conversation_id': m.conversation_id,
+        'sender_id': m.sender_id,
+        'receiver_id': m.receiver_id,
+        'content': m.content,
+        'timestamp': m.timestamp.isoformat() if m.timestamp else None,
+    }
+
+def get_or_create_conversation(user_id, other_id):
+    user_a_id, user_b_id = sorted((user_id, other_id))
+    conversation = Conversation.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).first()
+    if conversation is not None:
+        return conversation
+    try:
+        with db.session.begin_nested():
+            conversation = Conversation(user_a_id=user_a_id, user_b_id=user_b_id)
+            db.session.add(conversation)
+            db.session.flush()
+            db.session.add_all([
+                ConversationMember(conversation_id=conversation.id, user_id=user_id, other_user_id=other_id),
+                ConversationMember(conversation_id=conversation.id, user_id=other_id, other_user_id=user_id),
+            ])
+    except IntegrityError:
+        # Both users opened it at once and the other request won; a locking read sees
+        # its row even under MySQL's repeatable read
+        conversation = (Conversation.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id)
+                        .with_for_update().one())
+    return conversation
+
+def page_size():
+    return min(int(request.args.get('per_page', 20)), MAX_PER_PAGE)
+
+@messaging_bp.route('/api/messages', methods=['POST'])
+@jwt_required()
+def send_message():
+    sender_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    content = str(data.get('content', '')).strip()
+    try:
+        receiver_id = int(data.get('receiver_id'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'receiver_id is required'}), 400
+    if not content:
+        return jsonify({'error': 'Content is required'}), 400
+    if len(content) > MAX_MESSAGE_LENGTH:
+        return jsonify({'error': 'Message too long'}), 400
+    if receiver_id == sender_id or not user_cache.get(receiver_id):
+        return jsonify({'error': 'Invalid receiver'}), 400
+
+    conversation = get_or_create_conversation(sender_id, receiver_id)
+    message = Message(conversation_id=conversation.id, sender_id=sender_id,
+                      receiver_id=receiver_id, content=content, timestamp=datetime.utcnow())
+    db.session.add(message)
+    db.session.flush()
+    conversation.last_message_id = message.id
+    conversation.last_message_at = message.timestamp
+    conversation.last_sender_id = sender_id
+    conversation.last_message_preview = content[:200]
+    ConversationMember.query.filter_by(conversation_id=conversation.id).update({
+        ConversationMember.last_message_at: message.timestamp,
+        ConversationMember.unread_count: db.case(
+            (ConversationMember.user_id == receiver_id, ConversationMember.unread_count + 1),
+            else_=ConversationMember.unread_count),
+    }, synchronize_session=False)
+    db.session.commit()
+    payload = message_to_dict(message)
+    # Push to every open stream of both participants (the sender may have other tabs open)
+    pubsub.publish(f'user:{receiver_id}', payload)
+    pubsub.publish(f'user:{sender_id}', payload)
+    return jsonify(payload), 201
+
+@messaging_bp.route('/api/messages/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_messages():
+    """Server-sent events for new messages. EventSource cannot set headers, so ?jwt= works too."""
+    user_id = int(get_jwt_identity())
+    try:
+        subscription = pubsub.subscribe(f'user:{user_id}', user_id)
+    except TooManyConnections as e:
+        return jsonify({'error': str(e)}), 503
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+
+    def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ': keepalive\n\n'
+                elif event is OVERFLOW:
+                    yield 'event: overflow\ndata: {}\n\n'
+                    return
+                else:
+                    yield f'event: message\ndata: {json.dumps(event)}\n\n'
+        finally:
+            pubsub.unsubscribe(subscription)
+
+    # No stream_with_context: the request (and its DB session) ends before streaming starts
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@messaging_bp.route('/api/conversations', methods=['GET'])
+@jwt_required()
+def list_conversations():
+    user_id = int(get_jwt_identity())
+    per_page = page_size()
+    query = (db.session.query(ConversationMember, Conversation, User)
+             .join(Conversation, Conversation.id == ConversationMember.conversation_id)
+             .join(User, User.id == ConversationMember.other_user_id)
+             .filter(ConversationMember.user_id == user_id))
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_at, last_id = decode_cursor(cursor, 'last_message_at')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(db.or_(
+            ConversationMember.last_message_at < last_at,
+            db.and_(ConversationMember.last_message_at == last_at, ConversationMember.conversation_id < last_id)))
+    rows = (query.order_by(ConversationMember.last_message_at.desc(), ConversationMember.conversation_id.desc())
+            .limit(per_page + 1).all())
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1][0]
+        next_cursor = encode_cursor('last_message_at', last.last_message_at, last.conversation_id)
+    return jsonify({
+        'conversations': [{
+            'id': conversation.id,
+            'other_user': {'id': other.id, 'username': other.username, 'avatar': other.avatar},
+            'unread_count': member.unread_count,
+            'last_message': {
+                'id': conversation.last_message_id,
+                'sender_id': conversation.last_sender_id,
+                'preview': conversation.last_message_preview,
+                'timestamp': conversation.last_message_at.isoformat() if conversation.last_message_at else None,
+            },
+        } for member, conversation, other in rows],
+        'per_page': per_page,
+        'next_cursor': next_cursor
+    })
+
+@messaging_bp.route('/api/conversations/<int:conversation_id>/messages', methods=['GET'])
+@jwt_required()
+def list_messages(conversation_id):
+    user_id = int(get_jwt_identity())
+    member = ConversationMember.query.get((conversation_id, user_id))
+    if member is None:
+        return jsonify({'error': 'Conversation not found'}), 404
+    per_page = page_size()
+    query = Message.query.filter(Message.conversation_id == conversation_id)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_at, last_id = decode_cursor(cursor, 'timestamp')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(db.or_(
+            Message.timestamp < last_at,
+            db.and_(Message.timestamp == last_at, Message.id < last_id)))
+    elif member.unread_count:
+        # Reading the newest page marks the conversation as read
+        member.unread_count = 0
+        db.session.commit()
+    messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(messages) > per_page:
+        messages = messages[:per_page]
+        next_cursor = encode_cursor('timestamp', messages[-1].timestamp, messages[-1].id)
+    return jsonify({
+        'messages': [message_to_dict(m) for m in messages],
+        'per_page': per_page,
+        'next_cursor': next_cursor
+    })
@@ -1,13 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db
+from extensions import db, cache, limiter
 from models.post import Post
 from models.user import User
+from models.tag import Tag, post_tag
+from models.feed import TimelineEntry
+from search import apply_search
+from counters import post_counters
+from media_store import media_store, FileTooLarge, InvalidMedia, MEDIA_KEY_PATTERN
+from models.media import MediaUpload, TranscodeJob
+from versions import bump, conditional
+from db_routing import replica_reads
+from video_worker import video_queue, VIDEO_EXTENSIONS
+from static_media import send_media, set_cache_headers
 import os
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import ClientDisconnected
 from datetime import datetime
-from collections import Counter
-import time
+import base64
+import json
 from flask_cors import cross_origin
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi'}
@@ -18,14 +28,150 @@ posts_bp = Blueprint('posts', __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'post_media')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# In-memory cache for categories and tags
-_categories_cache = {'data': None, 'timestamp': 0}
-_tags_cache = {'data': None, 'timestamp': 0}
+# Shared cache keys for categories and tags
+CATEGORIES_CACHE_KEY = 'posts:categories'
+TAGS_CACHE_KEY = 'posts:popular-tags'
 CACHE_TIMEOUT = 300  # 5 minutes
 
+# Fields a post is serialized with, and that ?fields= can choose from
+POST_FIELDS = ('id', 'user_id', 'content', 'media_url', 'video_url', 'poster_url', 'created_at',
+               'category', 'visibility', 'tags', 'likes_count', 'views_count')
+
+# Rows fetched per round trip by /api/posts/export
+EXPORT_BATCH_SIZE = 500
+
+# Columns that can be used as a sort key in cursor mode
+CURSOR_SORT_FIELDS = {'created_at', 'likes_count', 'views_count', 'id'}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def parse_tags(values):
+    """Normalize tags given as repeated fields and/or comma-separated lists."""
+    names = []
+    for value in values:
+        for name in str(value).split(','):
+            name = Tag.normalize(name)
+            if name and name not in names:
+                names.append(name)
+    return names
+
+def save_post_tags(post, names):
+    """Link a flushed post to its tags in post_tag."""
+    tags = Tag.get_or_create_all(names)
+    db.session.flush()
+    if tags:
+        tag_ids = [t.id for t in tags]
+        db.session.execute(post_tag.insert(), [{'post_id': post.id, 'tag_id': tag_id} for tag_id in tag_ids])
+        update_tag_counts(tag_ids, 1)
+
+def remove_post_tags(post):
+    """Unlink a post from its tags and decrement their counts."""
+    tag_ids = [row[0] for row in db.session.execute(
+        db.select(post_tag.c.tag_id).where(post_tag.c.post_id == post.id))]
+    if tag_ids:
+        db.session.execute(post_tag.delete().where(post_tag.c.post_id == post.id))
+        update_tag_counts(tag_ids, -1)
+
+def update_tag_counts(tag_ids, delta):
+    db.session.execute(
+        Tag.__table__.update()
+        .where(Tag.id.in_(tag_ids))
+        .values(post_count=Tag.post_count + delta)
+    )
+
+def filter_by_tags(query, names):
+    """Restrict a Post query to posts having all the given tags via post_tag joins."""
+    tag_ids = [t.id for t in Tag.query.filter(Tag.name.in_(names)).all()]
+    if len(tag_ids) < len(names):
+        return query.filter(db.false())
+    for tag_id in tag_ids:
+        link = post_tag.alias()
+        query = query.join(link, db.and_(link.c.post_id == Post.id, link.c.tag_id == tag_id))
+    return query
+
+def parse_fields(value, allowed):
+    """?fields=a,b as a tuple in the order of allowed; all of allowed when absent."""
+    if not value:
+        return allowed
+    wanted = {f.strip() for f in value.split(',') if f.strip()}
+    unknown = wanted - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in allowed if f in wanted)
+
+def post_to_dict(p, fields=POST_FIELDS):
+    """Works on Post objects and on column rows from with_entities(); p must have id."""
+    # created_at stays a datetime; the JSON provider writes it as ISO 8601
+    data = {field: getattr(p, field) for field in fields}
+    for counter in ('likes_count', 'views_count'):
+        if counter in data:
+            data[counter] = (data[counter] or 0) + post_counters.pending(p.id, counter)
+    return data
+
+def load_authors(user_ids):
+    """Compact author projections for a page of posts, fetched in one IN query."""
+    if not user_ids:
+        return {}
+    rows = (db.session.query(User.id, User.username, User.title, User.avatar)
+            .filter(User.id.in_(set(user_ids))).all())
+    return {row.id: {'id': row.id, 'username': row.username, 'title': row.title, 'avatar': row.avatar}
+            for row in rows}
+
+def serialize_posts(posts, fields=POST_FIELDS):
+    """post_to_dict for a page, plus any ?include= expansions."""
+    data = [post_to_dict(p, fields) for p in posts]
+    if 'author' in request.args.get('include', '').split(','):
+        authors = load_authors([p.user_id for p in posts])
+        for post, item in zip(posts, data):
+            item['author'] = authors.get(post.user_id)
+    return data
+
+def select_listing_columns(query, fields, *extra):
+    """Load only the columns a listing needs, as plain rows instead of tracked Post objects."""
+    wanted = set(fields) | {'id'} | set(extra)
+    if 'author' in request.args.get('include', '').split(','):
+        wanted.add('user_id')
+    return query.with_entities(*[getattr(Post, f) for f in POST_FIELDS if f in wanted])
+
+def encode_cursor(sort, value, post_id):
+    """Build an opaque cursor from the last row's sort key and id."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """Return (value, id) from a cursor, or raise ValueError if it is invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, post_id = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort:
+        raise ValueError('Cursor does not match sort')
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value, int(post_id)
+
+def apply_cursor(query, sort, order, cursor):
+    """Order by (sort, id) and seek past the cursor instead of using OFFSET."""
+    sort_field = getattr(Post, sort)
+    if order == 'asc':
+        query = query.order_by(sort_field.asc(), Post.id.asc())
+    else:
+        query = query.order_by(sort_field.desc(), Post.id.desc())
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if sort == 'id':
+            seek = Post.id > last_id if order == 'asc' else Post.id < last_id
+        elif order == 'asc':
+            seek = db.or_(sort_field > value, db.and_(sort_field == value, Post.id > last_id))
+        else:
+            seek = db.or_(sort_field < value, db.and_(sort_field == value, Post.id < last_id))
+        query = query.filter(seek)
+    return query
+
 @posts_bp.route('/api/posts', methods=['POST'])
 @jwt_required()
 def create_post():
@@ -47,108 +193,278 @@ def create_post():
     if file:
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type'}), 422
-        file.seek(0, os.SEEK_END)
-        file_length = file.tell()
-        file.seek(0)
-        if file_length > MAX_FILE_SIZE:
+        # Hashed while streamed to the store; identical files are kept once
+        ext = file.filename.rsplit('.', 1)[1]
+        try:
+            media_url = f"/media/{media_store.put(file.stream, ext, MAX_FILE_SIZE)}"
+        except FileTooLarge:
             return jsonify({'error': 'File too large'}), 422
-        filename = f"{user_id}_{int(datetime.utcnow().timestamp())}_{secure_filename(file.filename)}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        media_url = f"/post_media/{filename}"
-    post = Post(user_id=user_id, content=content, media_url=media_url)
+    elif request.form.get('upload_id'):
+        # Media sent beforehand through the resumable upload routes; the post takes over its reference
+        upload = MediaUpload.query.get(request.form['upload_id'])
+        if not upload or str(upload.user_id) != str(user_id) or not upload.media_key:
+            return jsonify({'error': 'Upload not found or not complete'}), 422
+        media_url = f"/media/{upload.media_key}"
+        db.session.delete(upload)
+    tags = parse_tags(request.form.getlist('tags'))
+    post = Post(user_id=user_id, content=content, media_url=media_url, tags=tags or None)
     db.session.add(post)
+    db.session.flush()
+    save_post_tags(post, tags)
+    transcode = media_url and media_url.startswith('/media/') and media_url.rsplit('.', 1)[1] in VIDEO_EXTENSIONS
+    if transcode:
+        video_queue.enqueue(post, media_url[len('/media/'):])
+    bump('post')
+    if post.visibility in (None, 'public'):
+        follower_count = db.session.query(User.follower_count).filter(User.id == user_id).scalar() or 0
+        TimelineEntry.fan_out(post, follower_count)
     db.session.commit()
+    if transcode:
+        video_queue.notify()
     # Invalidate categories and tags cache
-    _categories_cache['data'] = None
-    _tags_cache['data'] = None
+    cache.delete(CATEGORIES_CACHE_KEY, TAGS_CACHE_KEY)
     return jsonify({
         'id': post.id,
         'user_id': post.user_id,
         'content': post.content,
         'media_url': post.media_url,
+        'video_url': post.video_url,
+        'poster_url': post.poster_url,
+        'tags': post.tags,
         'created_at': post.created_at.isoformat()
     }), 201
 
-@posts_bp.route('/api/posts', methods=['GET'])
-def list_posts():
-    # Query params
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 10))
-    sort = request.args.get('sort', 'created_at')
-    order = request.args.get('order', 'desc')
+def filter_posts(query):
+    """Apply the category/visibility/search/tags filters from the query string. Returns (query, rank)."""
     category = request.args.get('category')
     visibility = request.args.get('visibility')
     search = request.args.get('search')
     tags = request.args.getlist('tags')
-
-    query = Post.query
-
     if category:
         query = query.filter(Post.category == category)
     if visibility:
         query = query.filter(Post.visibility == visibility)
+    rank = None
     if search:
-        query = query.filter(Post.content.ilike(f'%{search}%'))
+        query, rank = apply_search(query, search)
     if tags:
-        for tag in tags:
-            query = query.filter(Post.tags.contains([tag]))
+        query = filter_by_tags(query, parse_tags(tags))
+    return query, rank
+
+@posts_bp.route('/api/posts', methods=['GET'])
+@replica_reads
+@conditional('post', 'user', 'post_counters')
+def list_posts():
+    # Query params
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 10))
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc')
+    try:
+        fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query, rank = filter_posts(Post.query)
+
+    # Cursor mode: opt in with ?cursor= (empty for the first page)
+    if 'cursor' in request.args:
+        if sort not in CURSOR_SORT_FIELDS:
+            sort = 'created_at'
+        try:
+            query = apply_cursor(query, sort, order, request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        posts = select_listing_columns(query, fields, sort).limit(per_page + 1).all()
+        next_cursor = None
+        if len(posts) > per_page:
+            posts = posts[:per_page]
+            last = posts[-1]
+            next_cursor = encode_cursor(sort, getattr(last, sort), last.id)
+        return jsonify({
+            'posts': serialize_posts(posts, fields),
+            'per_page': per_page,
+            'next_cursor': next_cursor
+        })
 
     # Sorting
     sort_field = getattr(Post, sort, Post.created_at)
-    if order == 'asc':
+    if sort == 'relevance' and rank is not None:
+        query = query.order_by(rank, Post.id.desc())
+    elif order == 'asc':
         query = query.order_by(sort_field.asc())
     else:
         query = query.order_by(sort_field.desc())
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = select_listing_columns(query, fields).paginate(page=page, per_page=per_page, error_out=False)
     posts = pagination.items
     return jsonify({
-        'posts': [
-        {
-            'id': p.id,
-            'user_id': p.user_id,
-            'content': p.content,
-            'media_url': p.media_url,
-                'created_at': p.created_at.isoformat() if p.created_at else None,
-                'category': p.category,
-                'visibility': p.visibility,
-                'tags': p.tags,
-                'likes_count': p.likes_count,
-                'views_count': p.views_count,
-        } for p in posts
-        ],
+        'posts': serialize_posts(posts, fields),
         'total': pagination.total,
         'page': pagination.page,
         'per_page': pagination.per_page,
         'pages': pagination.pages
     })
 
+@posts_bp.route('/api/posts/export', methods=['GET'])
+@jwt_required()
+def export_posts():
+    """Every post matching the list_posts filters as NDJSON, newest first, streamed as rows are read.
+
+    Rows are fetched EXPORT_BATCH_SIZE at a time and written out as they
+    arrive, so memory stays flat however many posts match.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query, _ = filter_posts(Post.query)
+    query = (select_listing_columns(query, fields)
+             .order_by(Post.created_at.desc(), Post.id.desc())
+             .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    dumps = current_app.json.dumps
+
+    def rows():
+        for row in query:
+            yield dumps(post_to_dict(row, fields)) + '\n'
+
+    # The generator reads from the database, so it needs the request (and its session) kept open
+    return Response(stream_with_context(rows()), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': 'attachment; filename=posts.ndjson',
+        'X-Accel-Buffering': 'no',
+    })
+
+def upload_to_dict(upload):
+    return {
+        'id': upload.id,
+        'size': upload.size,
+        'offset': upload.received,
+        'complete': upload.media_key is not None,
+        'media_url': f"/media/{upload.media_key}" if upload.media_key else None,
+    }
+
+def get_own_upload(upload_id):
+    upload = MediaUpload.query.get(upload_id)
+    if upload is None or str(upload.user_id) != str(get_jwt_identity()):
+        return None
+    return upload
+
+@posts_bp.route('/api/posts/uploads', methods=['POST'])
+@jwt_required()
+def start_upload():
+    """Open a resumable media upload: {"filename": ..., "size": bytes}."""
+    data = request.get_json() or {}
+    filename = str(data.get('filename', ''))
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 422
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size is required'}), 400
+    if size <= 0:
+        return jsonify({'error': 'size is required'}), 400
+    if size > current_app.config['MEDIA_MAX_UPLOAD_SIZE']:
+        return jsonify({'error': 'File too large'}), 413
+    upload = media_store.start_upload(int(get_jwt_identity()), filename.rsplit('.', 1)[1], size)
+    db.session.commit()
+    return jsonify(upload_to_dict(upload)), 201
+
+@posts_bp.route('/api/posts/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def upload_status(upload_id):
+    """Where to resume an interrupted upload from."""
+    upload = get_own_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload_to_dict(upload)), 200, {'Upload-Offset': str(upload.received)}
+
+@posts_bp.route('/api/posts/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def append_upload(upload_id):
+    """Append the raw request body at the Upload-Offset header, which must match the stored offset."""
+    upload = get_own_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    if request.headers.get('Upload-Offset', type=int) != upload.received or upload.media_key:
+        return jsonify(dict(upload_to_dict(upload), error='Offset mismatch')), 409
+    if request.content_length and upload.received + request.content_length > upload.size:
+        return jsonify({'error': 'File too large'}), 413
+    try:
+        # request.stream reads straight from the socket, nothing is buffered beyond one chunk
+        media_store.append_upload(upload, request.stream)
+    except (FileTooLarge, InvalidMedia) as e:
+        media_store.abort_upload(upload)
+        db.session.commit()
+        return jsonify({'error': str(e)}), 413 if isinstance(e, FileTooLarge) else 415
+    except ClientDisconnected:
+        # Keep what arrived; the client resumes from upload_status
+        db.session.commit()
+        return jsonify({'error': 'Upload interrupted'}), 400
+    db.session.commit()
+    return jsonify(upload_to_dict(upload)), 200, {'Upload-Offset': str(upload.received)}
+
+@posts_bp.route('/api/posts/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(upload_id):
+    upload = get_own_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    media_store.abort_upload(upload)
+    db.session.commit()
+    return jsonify({'msg': 'Upload cancelled'}), 200
+
+@posts_bp.route('/api/posts/<int:post_id>', methods=['DELETE'])
+@jwt_required()
+def delete_post(post_id):
+    post = Post.query.get(post_id)
+    if not post:
+        return jsonify({'error': 'Post not found'}), 404
+    if str(post.user_id) != str(get_jwt_identity()):
+        return jsonify({'error': 'Not allowed to delete this post'}), 403
+    remove_post_tags(post)
+    TimelineEntry.remove_post(post.id)
+    TranscodeJob.query.filter_by(post_id=post.id).delete()
+    for url in (post.media_url, post.video_url, post.poster_url):
+        if url and url.startswith('/media/'):
+            media_store.release(url[len('/media/'):])
+    db.session.delete(post)
+    bump('post')
+    db.session.commit()
+    cache.delete(CATEGORIES_CACHE_KEY, TAGS_CACHE_KEY)
+    return jsonify({'msg': 'Post deleted'}), 200
+
+@posts_bp.route('/api/posts/<int:post_id>/view', methods=['POST'])
+@limiter.limit(lambda: current_app.config.get('VIEW_RATE_LIMIT', '120 per minute'))
+def record_view(post_id):
+    views = db.session.query(Post.views_count).filter(Post.id == post_id).first()
+    if views is None:
+        return jsonify({'error': 'Post not found'}), 404
+    # Buffered; written back in batches by the counter flusher
+    post_counters.incr(post_id, 'views_count')
+    return jsonify({'views_count': (views[0] or 0) + post_counters.pending(post_id, 'views_count')}), 200
+
 @posts_bp.route('/api/posts/categories', methods=['GET'])
+@replica_reads
+@conditional('post')
 def get_categories():
-    now = time.time()
-    if _categories_cache['data'] is not None and now - _categories_cache['timestamp'] < CACHE_TIMEOUT:
-        return jsonify({'categories': _categories_cache['data']})
+    return jsonify({'categories': cache.get_or_set(CATEGORIES_CACHE_KEY, load_categories, CACHE_TIMEOUT)})
+
+def load_categories():
     categories = db.session.query(Post.category).distinct().all()
-    categories = [c[0] for c in categories if c[0]]
-    _categories_cache['data'] = categories
-    _categories_cache['timestamp'] = now
-    return jsonify({'categories': categories})
+    return [c[0] for c in categories if c[0]]
 
 @posts_bp.route('/api/posts/popular-tags', methods=['GET'])
+@replica_reads
+@conditional('post')
 def get_popular_tags():
-    now = time.time()
-    if _tags_cache['data'] is not None and now - _tags_cache['timestamp'] < CACHE_TIMEOUT:
-        return jsonify({'tags': _tags_cache['data']})
-    all_tags = db.session.query(Post.tags).all()
-    tag_counter = Counter()
-    for tags in all_tags:
-        if tags[0]:
-            tag_counter.update(tags[0])
-    popular_tags = [tag for tag, _ in tag_counter.most_common(20)]
-    _tags_cache['data'] = popular_tags
-    _tags_cache['timestamp'] = now
-    return jsonify({'tags': popular_tags})
+    return jsonify({'tags': cache.get_or_set(TAGS_CACHE_KEY, load_popular_tags, CACHE_TIMEOUT)})
+
+def load_popular_tags():
+    popular = (Tag.query.with_entities(Tag.name)
+               .filter(Tag.post_count > 0)
+               .order_by(Tag.post_count.desc(), Tag.id.desc())
+               .limit(20).all())
+    return [name for name, in popular]
 
 # Serve media files
 def register_media_route(app):
@@ -156,6 +472,16 @@ def register_media_route(app):
     @cross_origin(origins=["https://prok-frontend-lelx.onrender.com", "http://localhost:5173"])  # Add your frontend origins here
     def serve_post_media(filename):
         folder = os.path.join(os.path.dirname(__file__), '..', 'post_media')
-        return send_from_directory(folder, filename)
+        return send_media(folder, filename)
+
+    @app.route('/media/<key>')
+    @cross_origin(origins=["https://prok-frontend-lelx.onrender.com", "http://localhost:5173"])
+    def serve_media(key):
+        if not MEDIA_KEY_PATTERN.match(key):
+            return jsonify({'error': 'Not found'}), 404
+        if media_store.backend.local:
+            return send_media(os.path.dirname(media_store.backend.path(key)), key)
+        response = send_file(media_store.open(key), download_name=key, etag=key, conditional=True)
+        return set_cache_headers(response, key)
 
 # Routes will be implemented here 
\ No newline at end of file
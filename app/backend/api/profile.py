@@ -5,8 +5,14 @@ from models.profile import Profile
 from models.user import User
 import os
 from werkzeug.utils import secure_filename
-from PIL import Image
-import time
+import uuid
+from image_worker import submit_avatar, job_status, rendition_name, RENDITION_SIZES, DEFAULT_SIZE
+from media_store import write_hashed, FileTooLarge
+from static_media import send_media
+from user_cache import user_cache
+from versions import bump
+from db_routing import replica_reads
+from api.posts import parse_fields
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -17,25 +23,26 @@ MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def user_to_dict(user):
-    return {
-        'username': user.username,
-        'email': user.email,
-        'bio': user.bio,
-        'skills': user.skills,
-        'title': user.title,
-        'location': user.location,
-        'social': user.social,
-        'education': user.education,
-        'avatar': user.avatar,
-    }
+# Fields a profile is serialized with, and that ?fields= can choose from
+USER_FIELDS = ('username', 'email', 'bio', 'skills', 'title', 'location', 'social', 'education', 'avatar')
+
+def user_to_dict(user, fields=USER_FIELDS):
+    return {field: getattr(user, field) for field in fields}
 
 @profile_bp.route('/api/profile', methods=['GET', 'PUT'])
+@replica_reads
 @jwt_required()
 def profile():
-    user = User.query.get(get_jwt_identity())
     if request.method == 'GET':
-        return jsonify(user_to_dict(user)), 200
+        try:
+            fields = parse_fields(request.args.get('fields'), USER_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Read fresh rather than from user_cache, which another worker may still hold
+        # from before the owner's last edit
+        user = User.query.get(get_jwt_identity())
+        return jsonify(user_to_dict(user, fields)), 200
+    user = User.query.get(get_jwt_identity())
     data = request.get_json()
     # Simple validation
     if 'email' in data and '@' not in data['email']:
@@ -53,7 +60,9 @@ def profile():
     for field in ['bio', 'skills', 'title', 'location', 'social', 'education']:
         if field in data:
             setattr(user, field, data[field])
+    bump('user')
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify(user_to_dict(user)), 200
 
 @profile_bp.route('/api/profile/image', methods=['POST'])
@@ -66,27 +75,63 @@ def upload_profile_image():
         return jsonify({'error': 'No selected file'}), 400
     if not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file type'}), 400
-    file.seek(0, os.SEEK_END)
-    if file.tell() > MAX_FILE_SIZE:
-        return jsonify({'error': 'File too large'}), 400
-    file.seek(0)
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # Store the raw upload and hand the decode/resize to the image worker pool
+    incoming = os.path.join(UPLOAD_FOLDER, 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    user_id = int(get_jwt_identity())
     ext = file.filename.rsplit('.', 1)[1].lower()
-    filename = secure_filename(f"{get_jwt_identity()}_{int(time.time())}.{ext}")
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    # Image processing: resize, compress, convert
-    image = Image.open(file)
-    image = image.convert('RGB')
-    image.thumbnail((400, 400))
-    image.save(filepath, format='JPEG', quality=85)
-    user = User.query.get(get_jwt_identity())
-    user.avatar = f"/profile_images/{filename}"
-    db.session.commit()
-    return jsonify({'avatar': user.avatar}), 200
+    source = os.path.join(incoming, f"{uuid.uuid4().hex}.{ext}")
+    try:
+        digest, _ = write_hashed(file.stream, source, MAX_FILE_SIZE)
+    except FileTooLarge:
+        os.remove(source)
+        return jsonify({'error': 'File too large'}), 400
+    # Renditions are named after the upload's SHA-256, so the same image is only processed once
+    basename = digest
+    if os.path.exists(os.path.join(UPLOAD_FOLDER, rendition_name(basename, DEFAULT_SIZE, 'jpg'))):
+        os.remove(source)
+        user = User.query.get(user_id)
+        user.avatar = f'/profile_images/{rendition_name(basename, DEFAULT_SIZE, "jpg")}'
+        bump('user')
+        db.session.commit()
+        user_cache.invalidate(user_id)
+        return jsonify({'status': 'done', 'user_id': user_id, 'avatar': user.avatar}), 200
+    job_id = submit_avatar(current_app._get_current_object(), user_id, source, UPLOAD_FOLDER, basename)
+    return jsonify(dict(job_status(job_id), job_id=job_id)), 202
+
+@profile_bp.route('/api/profile/image/<job_id>', methods=['GET'])
+@jwt_required()
+def profile_image_status(job_id):
+    status = job_status(job_id)
+    if not status or status['user_id'] != int(get_jwt_identity()):
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(dict(status, job_id=job_id)), 200
+
+def pick_rendition(filename):
+    """Best existing rendition of an avatar for ?size= and the Accept header."""
+    basename, _, ext = filename.rpartition('.')
+    if ext.lower() != 'jpg':
+        return filename
+    try:
+        wanted = int(request.args.get('size', DEFAULT_SIZE))
+    except ValueError:
+        wanted = DEFAULT_SIZE
+    # Smallest rendition that is at least as large as requested
+    size = min((s for s in RENDITION_SIZES if s >= wanted), default=max(RENDITION_SIZES))
+    accepted = {mimetype for mimetype, _ in request.accept_mimetypes}
+    for ext, mimetype in (('avif', 'image/avif'), ('webp', 'image/webp'), ('jpg', None)):
+        if mimetype and mimetype not in accepted:
+            continue
+        candidate = rendition_name(basename, size, ext)
+        if os.path.exists(os.path.join(UPLOAD_FOLDER, candidate)):
+            return candidate
+    return filename
 
 # Serve images
 @profile_bp.route('/profile_images/<filename>')
 def serve_profile_image(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    response = send_media(UPLOAD_FOLDER, pick_rendition(secure_filename(filename)))
+    response.vary.add('Accept')
+    return response
 
 # Routes will be implemented here 
\ No newline at end of file
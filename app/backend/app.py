@@ -1,24 +1,46 @@
 import os
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
-from extensions import db, migrate, jwt, limiter
+from extensions import db, migrate, jwt, limiter, cache, pubsub, passwords
 from api import register_blueprints
+from counters import post_counters
+from media_store import media_store
+from static_media import send_media
+from video_worker import video_queue
+from user_cache import user_cache
+import json_provider
+import db_routing
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    json_provider.init_app(app)
+    if app.config.get('TRUSTED_PROXIES'):
+        # Client address and scheme from the proxy's X-Forwarded-* headers
+        n = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=n, x_proto=n)
 
     # Debug: print JWT config
     print('DEBUG: JWT_SECRET_KEY:', app.config.get('JWT_SECRET_KEY'))
     print('DEBUG: JWT_ACCESS_TOKEN_EXPIRES:', app.config.get('JWT_ACCESS_TOKEN_EXPIRES'))
 
     # Initialize extensions
+    db_routing.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     limiter.init_app(app)
+    cache.init_app(app)
+    pubsub.init_app(app)
+    passwords.init_app(app)
+    post_counters.init_app(app)
+    media_store.init_app(app)
+    video_queue.init_app(app)
+    user_cache.init_app(app, jwt)
     # CORS configuration
     ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5173,http://localhost:5174,http://localhost:5175,http://127.0.0.1:5173,http://127.0.0.1:5174,http://127.0.0.1:5175,https://your-frontend-url.onrender.com').split(',')
     
@@ -35,6 +57,9 @@ def create_app(config_class=Config):
     # JWT error handler for debugging
     @app.errorhandler(Exception)
     def handle_exception(e):
+        if isinstance(e, HTTPException):
+            # 404s, 405s, rate limit 429s etc. keep their status
+            return e
         import traceback
         print('DEBUG: Global Exception:', e)
         traceback.print_exc()
@@ -69,6 +94,12 @@ def create_app(config_class=Config):
             'timestamp': '2024-01-01T00:00:00Z'
         }), 200
 
+    # Cache hit/miss counts for the worker that answers
+    @app.route('/api/cache/stats')
+    @jwt_required()
+    def cache_stats():
+        return jsonify(cache.stats()), 200
+
     # Import User model inside app context for migration
     with app.app_context():
         from models.user import User
@@ -78,7 +109,7 @@ def create_app(config_class=Config):
     @app.route('/profile_images/<filename>')
     def serve_profile_image(filename):
         upload_folder = os.path.join(os.path.dirname(__file__), 'profile_images')
-        return send_from_directory(upload_folder, filename)
+        return send_media(upload_folder, filename)
 
     return app
 
@@ -0,0 +1,88 @@
+"""Throughput of profile image uploads under concurrent load.
+
+Fires --uploads concurrent POST /api/profile/image requests (--concurrency
+at a time) with large JPEGs, once with processing inline in the request
+thread and once with the process pool, and reports request latency, request
+throughput, and the time until every avatar is ready. Run from app/backend:
+
+    python -m benchmarks.bench_avatar_upload --uploads 40 --concurrency 8
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from flask_jwt_extended import create_access_token
+from config import Config
+from app import create_app
+from extensions import db
+from models.user import User
+import api.profile
+
+def make_jpeg(size):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+def upload(client, token, payload):
+    # Trailing bytes after the JPEG end marker make every upload distinct, so none is deduplicated
+    payload += os.urandom(16)
+    start = time.perf_counter()
+    response = client.post('/api/profile/image', headers={'Authorization': f'Bearer {token}'},
+                           data={'image': (io.BytesIO(payload), 'avatar.jpg')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202, response.get_json()
+    return time.perf_counter() - start, response.get_json()['job_id']
+
+def wait_done(client, token, job_ids):
+    pending = set(job_ids)
+    while pending:
+        for job_id in list(pending):
+            status = client.get(f'/api/profile/image/{job_id}',
+                                headers={'Authorization': f'Bearer {token}'}).get_json()
+            if status['status'] != 'pending':
+                pending.discard(job_id)
+        time.sleep(0.02)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uploads', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--size', type=int, default=2400)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        RATELIMIT_ENABLED = False
+
+    api.profile.UPLOAD_FOLDER = workdir
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    payload = make_jpeg((args.size, args.size))
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+    print(f'{args.uploads} uploads of {len(payload) // 1024} KB, {args.concurrency} concurrent, {os.cpu_count()} CPUs')
+    try:
+        for mode in ('inline', 'async'):
+            app.config['IMAGE_PROCESSING_MODE'] = mode
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                results = list(pool.map(lambda _: upload(client, token, payload), range(args.uploads)))
+            responded = time.perf_counter() - start
+            wait_done(client, token, [job_id for _, job_id in results])
+            finished = time.perf_counter() - start
+            latencies = sorted(latency * 1000 for latency, _ in results)
+            print(f'{mode:>6}: request p50={statistics.median(latencies):.0f}ms '
+                  f'p99={latencies[int(len(latencies) * 0.99) - 1]:.0f}ms, '
+                  f'{args.uploads / responded:.1f} req/s, all avatars ready in {finished:.2f}s')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
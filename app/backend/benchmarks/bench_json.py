@@ -0,0 +1,59 @@
+"""Serialization time per 1k posts for each JSON provider.
+
+Builds --posts post dicts the way list_posts does and times turning them
+into a response body with Flask's stock encoder (isoformat() per row, as
+before), the stdlib provider and the orjson provider. Run from
+app/backend:
+
+    python -m benchmarks.bench_json --posts 1000 --repeat 50
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import StdlibJSONProvider, OrjsonProvider, orjson
+from api.posts import post_to_dict
+
+def make_posts(n):
+    start = datetime(2025, 1, 1)
+    return [SimpleNamespace(
+        id=i, user_id=i % 97, content=f'Post {i} about python, flask and hiring. ' * 4,
+        media_url=None, video_url=None, poster_url=None, created_at=start + timedelta(seconds=i),
+        category='general', visibility='public', tags=['python', 'flask', f'tag{i % 13}'],
+        likes_count=i % 50, views_count=i % 500,
+    ) for i in range(n)]
+
+def measure(provider, posts, repeat, isoformat=False):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = [post_to_dict(p) for p in posts]
+        if isoformat:
+            for item in data:
+                item['created_at'] = item['created_at'].isoformat()
+        provider.response({'posts': data}).get_data()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    posts = make_posts(args.posts)
+    providers = [('flask default', DefaultJSONProvider(app), True), ('stdlib', StdlibJSONProvider(app), False)]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app), False))
+    else:
+        print('orjson not installed, skipping it')
+    with app.test_request_context():
+        baseline = None
+        for name, provider, isoformat in providers:
+            best = measure(provider, posts, args.repeat, isoformat)
+            per_1k = best * 1000 / args.posts * 1000
+            baseline = baseline or per_1k
+            print(f'{name:>14}: {per_1k:.2f} ms per 1k posts ({baseline / per_1k:.1f}x)')
@@ -0,0 +1,69 @@
+"""Login throughput per core under concurrent load.
+
+Fires --logins POST /api/login requests, --concurrency at a time, against
+one user whose password is hashed at --rounds, and reports successful
+logins per second (total and per hashing thread), latency, and how many
+requests were turned away with 503 because the hashing queue was full.
+Run from app/backend:
+
+    python -m benchmarks.bench_login --logins 64 --concurrency 32 --rounds 12
+    python -m benchmarks.bench_login --queue 4   # see fast rejection
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from app import create_app
+from extensions import db, passwords
+from models.user import User
+
+PASSWORD = 'Bench@1234'
+
+def login(client):
+    start = time.perf_counter()
+    response = client.post('/api/login', json={'username': 'bench', 'password': PASSWORD})
+    assert response.status_code in (200, 503), response.get_json()
+    return time.perf_counter() - start, response.status_code
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue', type=int, default=0, help='max running + waiting hashes, default 4 per worker')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        RATELIMIT_ENABLED = False
+        PASSWORD_BCRYPT_ROUNDS = args.rounds
+        PASSWORD_HASH_WORKERS = args.workers
+        PASSWORD_HASH_QUEUE = args.queue or 4 * args.workers
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    with app.app_context():
+        db.session.add(User(username='bench', email='bench@example.com', password_hash=passwords.hash(PASSWORD)))
+        db.session.commit()
+    print(f'{args.logins} logins, {args.concurrency} concurrent, bcrypt rounds={args.rounds}, '
+          f'{args.workers} hashing threads, queue={passwords.max_queue}, {os.cpu_count()} CPUs')
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(lambda _: login(client), range(args.logins)))
+        elapsed = time.perf_counter() - start
+        ok = sorted(latency * 1000 for latency, status in results if status == 200)
+        rejected = sorted(latency * 1000 for latency, status in results if status == 503)
+        print(f'{len(ok) / elapsed:.1f} logins/s, {len(ok) / elapsed / args.workers:.1f} per core, '
+              f'p50={statistics.median(ok):.0f}ms p99={ok[min(len(ok) - 1, int(len(ok) * 0.99))]:.0f}ms')
+        if rejected:
+            print(f'{len(rejected)} rejected with 503, p50={statistics.median(rejected):.1f}ms')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
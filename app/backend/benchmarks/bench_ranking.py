@@ -0,0 +1,91 @@
+"""Latency of building one reader's top feed, as /api/feed/top does on a cache miss.
+
+Seeds a temporary SQLite database with --posts recent public posts (plus
+tags, follows and the reader's own posts) and times load_top_feed: the
+candidate query, building the NumPy columns and the affinity lookups,
+scoring and top-k. Each size in --limits is run with FEED_CANDIDATE_LIMIT
+set to it; the endpoint's default is 5000. Run from app/backend:
+
+    python -m benchmarks.bench_ranking --runs 50
+    python -m benchmarks.bench_ranking --posts 100000 --limits 5000,10000,100000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from config import Config
+from app import create_app
+from extensions import db
+from models.post import Post
+from models.tag import Tag, post_tag
+from models.user import User
+from models.feed import Follow
+from api.feed import load_top_feed
+
+CATEGORIES = ['tech', 'design', 'jobs', 'events', None]
+READER_ID = 1
+
+def seed(posts, authors=1000, tags=50):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+        for i in range(1, authors + 1)])
+    db.session.execute(Tag.__table__.insert(), [
+        {'id': i, 'name': f'tag{i}', 'post_count': 0} for i in range(1, tags + 1)])
+    rows = [{
+        'id': i,
+        # The reader's own posts drive category/tag affinity
+        'user_id': READER_ID if i <= 100 else rng.randint(2, authors),
+        'content': f'Post {i}',
+        'created_at': now - timedelta(seconds=rng.uniform(0, 6.5 * 24 * 3600)),
+        'category': rng.choice(CATEGORIES),
+        'visibility': 'public',
+        'likes_count': rng.randint(0, 50),
+        'views_count': rng.randint(0, 500),
+    } for i in range(1, posts + 1)]
+    db.session.execute(Post.__table__.insert(), rows)
+    db.session.execute(post_tag.insert(), [
+        {'post_id': i, 'tag_id': tag_id}
+        for i in range(1, posts + 1) for tag_id in rng.sample(range(1, tags + 1), 2)])
+    db.session.execute(Follow.__table__.insert(), [
+        {'follower_id': READER_ID, 'followee_id': followee}
+        for followee in rng.sample(range(2, authors + 1), 150)])
+    db.session.commit()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--limits', default='1000,5000,10000')
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    app = create_app(BenchConfig)
+    try:
+        with app.app_context():
+            seed(args.posts)
+            print(f'{args.posts} posts in the candidate window, {args.runs} runs per limit')
+            for limit in (int(value) for value in args.limits.split(',')):
+                app.config['FEED_CANDIDATE_LIMIT'] = limit
+                load_top_feed(READER_ID)  # warm up
+                timings = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    load_top_feed(READER_ID)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    db.session.rollback()
+                p50, p99 = np.percentile(timings, [50, 99])
+                print(f'{min(limit, args.posts):>7} candidates: p50={p50:.1f}ms p99={p99:.1f}ms '
+                      f'mean={statistics.mean(timings):.1f}ms')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
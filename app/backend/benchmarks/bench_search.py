@@ -0,0 +1,64 @@
+"""Compare the full-text search backend with the old ILIKE scan.
+
+Seeds a throwaway SQLite database (or uses BENCH_DATABASE_URL) and times
+GET /api/posts?search=... for both paths. Run from app/backend:
+
+    python -m benchmarks.bench_search --posts 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from config import Config
+from app import create_app
+from extensions import db
+from models.post import Post
+from models.user import User
+
+WORDS = ('python flask react developer engineer remote hiring startup design data '
+         'cloud backend frontend mobile product manager intern senior junior career '
+         'network event launch team growth learning conference mentor').split()
+
+def seed(n_posts):
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    rows = [{'user_id': user.id, 'visibility': 'public',
+             'content': ' '.join(random.choices(WORDS, k=30)) + f' filler{i}'}
+            for i in range(n_posts)]
+    for start in range(0, n_posts, 5000):
+        db.session.execute(Post.__table__.insert(), rows[start:start + 5000])
+    db.session.commit()
+
+def run(client, terms):
+    timings = []
+    for term in terms:
+        start = time.perf_counter()
+        response = client.get(f'/api/posts?search={term}&per_page=20')
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=100)
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = os.environ.get('BENCH_DATABASE_URL') or \
+            'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        RATELIMIT_ENABLED = False
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    terms = [random.choice(WORDS)[:4] + '%20' + random.choice(WORDS) for _ in range(args.queries)]
+    with app.app_context():
+        seed(args.posts)
+        for backend in ('ilike', None):
+            app.config['SEARCH_BACKEND'] = backend
+            p50, p99 = run(client, terms)
+            print(f'{backend or "native":>8}: p50={p50:.1f}ms p99={p99:.1f}ms over {args.posts} posts')
@@ -0,0 +1,198 @@
+"""Small pluggable cache used for read-mostly API data.
+
+Backends are picked with CACHE_BACKEND:
+
+- memory:     per-process LRU with TTL (default, fine for a single worker)
+- filesystem: JSON files under CACHE_DIR, shared by every worker on the host
+- redis:      any Redis-compatible server at CACHE_REDIS_URL (needs `redis`)
+
+Shared backends make a delete in one gunicorn worker visible to all of
+them. get_or_set() recomputes a missing key once: other callers in the
+same process wait on a lock, and shared backends also hold a cross-process
+lock, so an expiry does not stampede the database.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+# get_or_set() serialises loads per key on one of these, picked by hash
+LOCAL_LOCK_STRIPES = 64
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.time() + timeout if timeout else 0, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def lock(self, key):
+        return nullcontext()
+
+class FileSystemBackend:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        if entry['expires'] and entry['expires'] < time.time():
+            return False, None
+        return True, entry['value']
+
+    def set(self, key, value, timeout):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'expires': time.time() + timeout if timeout else 0, 'value': value}, f)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(key) + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class RedisBackend:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package installed")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.client.get(key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key, value, timeout):
+        self.client.set(key, json.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def lock(self, key):
+        return self.client.lock(f'lock:{key}', timeout=30, blocking_timeout=30)
+
+class Cache:
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.prefix = 'prok:'
+        self.default_timeout = 300
+        # Lookups in this process, for stats()
+        self.hits = 0
+        self.misses = 0
+        self._locks = [threading.RLock() for _ in range(LOCAL_LOCK_STRIPES)]
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'filesystem':
+            self.backend = FileSystemBackend(app.config['CACHE_DIR'])
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', self.default_timeout)
+        app.extensions['cache'] = self
+
+    def _local_lock(self, key):
+        # A fixed set of locks, so memory does not grow with the number of keys
+        return self._locks[hash(key) % LOCAL_LOCK_STRIPES]
+
+    def get(self, key):
+        found, value = self.backend.get(self.prefix + key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(self.prefix + key, value, timeout or self.default_timeout)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.backend.delete(self.prefix + key)
+
+    def get_or_set(self, key, loader, timeout=None):
+        """Return the cached value for key, computing it with loader() at most once at a time.
+
+        A None from loader() is returned but not stored, so a miss is retried on the next call.
+        """
+        full_key = self.prefix + key
+        found, value = self.backend.get(full_key)
+        if found:
+            self.hits += 1
+            return value
+        with self._local_lock(full_key), self.backend.lock(full_key):
+            # Someone else may have filled it while we waited
+            found, value = self.backend.get(full_key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = loader()
+            if value is not None:
+                self.backend.set(full_key, value, timeout or self.default_timeout)
+            return value
+
+    def stats(self):
+        """Hit/miss counts of this process since it started (GET /api/cache/stats)."""
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
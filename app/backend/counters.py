@@ -0,0 +1,116 @@
+"""Write-behind buffering for Post.likes_count and Post.views_count.
+
+Increments are summed in memory per (post, field) and written back as one
+batched UPDATE ... SET views_count = views_count + :delta per flush, so a
+popular post costs one row update per interval instead of one per request.
+
+Flushes happen every COUNTER_FLUSH_INTERVAL seconds from a background
+thread, as soon as COUNTER_MAX_PENDING increments are waiting, and at
+process exit. A crash loses at most one interval's (or COUNTER_MAX_PENDING)
+worth of increments. Each gunicorn worker buffers its own deltas; since they
+are applied as increments, workers never overwrite each other.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import bindparam
+from extensions import db
+from models.post import Post
+from versions import bump
+
+FIELDS = ('likes_count', 'views_count')
+
+class CounterBuffer:
+    def __init__(self):
+        self.app = None
+        self.interval = 5.0
+        self.max_pending = 1000
+        self._pending = defaultdict(int)
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('COUNTER_FLUSH_INTERVAL', self.interval)
+        self.max_pending = app.config.get('COUNTER_MAX_PENDING', self.max_pending)
+        app.extensions['counters'] = self
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        # Started lazily, and again after a fork, so each worker has its own flusher
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='counter-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print('DEBUG: Counter flush failed:', e)
+
+    def incr(self, post_id, field, delta=1):
+        if field not in FIELDS:
+            raise ValueError(f'Unknown counter: {field}')
+        with self._lock:
+            self._pending[(post_id, field)] += delta
+            self._pending_total += abs(delta)
+            full = self._pending_total >= self.max_pending
+        self._ensure_thread()
+        if full:
+            self.flush()
+
+    def pending(self, post_id, field):
+        """Delta not yet written to the database."""
+        return self._pending.get((post_id, field), 0)
+
+    def get(self, post_id, field):
+        """Persisted value plus pending delta."""
+        persisted = db.session.query(getattr(Post, field)).filter(Post.id == post_id).scalar()
+        return (persisted or 0) + self.pending(post_id, field)
+
+    def flush(self):
+        """Write all pending deltas, one executemany UPDATE per field. Returns rows touched."""
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(int)
+            self._pending_total = 0
+        batch = {key: delta for key, delta in batch.items() if delta}
+        if not batch or self.app is None:
+            return 0
+        table = Post.__table__
+        with self.app.app_context():
+            try:
+                for field in FIELDS:
+                    rows = [{'post_id': post_id, 'delta': delta}
+                            for (post_id, f), delta in batch.items() if f == field]
+                    if rows:
+                        column = table.c[field]
+                        db.session.execute(
+                            table.update()
+                            .where(table.c.id == bindparam('post_id'))
+                            .values({field: db.func.coalesce(column, 0) + bindparam('delta')}),
+                            rows)
+                # Its own version, so categories and tags stay valid while views come in
+                bump('post_counters')
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Put the deltas back so a transient error does not lose them
+                with self._lock:
+                    for key, delta in batch.items():
+                        self._pending[key] += delta
+                        self._pending_total += abs(delta)
+                raise
+        return len(batch)
+
+post_counters = CounterBuffer()
@@ -0,0 +1,128 @@
+"""Sending read-only queries to database replicas.
+
+Replicas are listed in DATABASE_REPLICA_URLS and become the SQLAlchemy
+binds replica0, replica1, ... Nothing reads from them unless a view opts
+in with @replica_reads, and even then RoutingSession only sends plain
+SELECTs there. Inserts, updates, deletes, flushes, and anything after the
+first write in a session go to the primary. Each session sticks to one
+replica so a request does not mix snapshots.
+
+Read-your-writes: once a request commits a write, the client is pinned to
+the primary for REPLICA_STICKY_SECONDS, so a replica that is a moment
+behind cannot hide the post they just created. Clients are recognised by
+a hash of their access token; every write needs one, and addresses are not
+used because behind a proxy all clients share one. The pin is kept in the
+cache, which therefore has to be shared between workers: replicas are
+refused with the per-process memory backend (use CACHE_BACKEND=redis, or
+filesystem when every worker runs on one host).
+
+init_app() also sets the connection pool options (DB_POOL_* and
+DB_STATEMENT_TIMEOUT_MS) on the primary and every replica. Two SQLite
+files work as a primary/replica pair for trying this out locally.
+"""
+import hashlib
+import random
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_PREFIX = 'replica'
+
+def engine_options(app, url):
+    backend = make_url(url).get_backend_name()
+    # Check connections before use and replace them before the server or a proxy drops them idle
+    options = {'pool_pre_ping': True, 'pool_recycle': app.config.get('DB_POOL_RECYCLE', 280)}
+    if backend != 'sqlite':
+        options.update(pool_size=app.config.get('DB_POOL_SIZE', 5),
+                       max_overflow=app.config.get('DB_MAX_OVERFLOW', 10),
+                       pool_timeout=app.config.get('DB_POOL_TIMEOUT', 30))
+    timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    if timeout and backend == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout}'}
+    elif timeout and backend == 'mysql':
+        # MySQL only enforces this on SELECTs
+        options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={timeout}'}
+    return options
+
+def init_app(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS and the replica binds; call before db.init_app()."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app, app.config['SQLALCHEMY_DATABASE_URI']),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    urls = [u.strip() for u in (app.config.get('DATABASE_REPLICA_URLS') or '').split(',') if u.strip()]
+    if urls and app.config.get('CACHE_BACKEND', 'memory') not in ('redis', 'filesystem'):
+        raise RuntimeError('DATABASE_REPLICA_URLS needs a cache shared by every worker for read-your-writes; '
+                           'set CACHE_BACKEND=redis (or filesystem)')
+    for i, url in enumerate(urls):
+        if url.startswith('postgres://'):
+            url = url.replace('postgres://', 'postgresql://', 1)
+        binds[f'{REPLICA_PREFIX}{i}'] = {'url': url, **engine_options(app, url)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+def replica_keys(engines):
+    return [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_PREFIX)]
+
+def client_key():
+    """Cache key of the pin for this request's access token, or None for anonymous requests."""
+    auth = request.headers.get('Authorization')
+    if not auth:
+        return None
+    return f'db-sticky:{hashlib.sha1(auth.encode()).hexdigest()}'
+
+def is_pinned():
+    key = client_key()
+    return key is not None and bool(current_app.extensions['cache'].get(key))
+
+def pin_to_primary():
+    key = client_key()
+    if key is not None:
+        current_app.extensions['cache'].set(key, True, current_app.config.get('REPLICA_STICKY_SECONDS', 10))
+
+def use_replicas():
+    """Let this request's SELECTs go to a replica, unless the client just wrote something."""
+    if replica_keys(current_app.config.get('SQLALCHEMY_BINDS') or {}):
+        g.db_replica_reads = not is_pinned()
+
+def replica_reads(view):
+    """use_replicas() for GET requests to the view; other methods stay on the primary."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            use_replicas()
+        return view(*args, **kwargs)
+    return wrapper
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not self.info.get('wrote')
+                and getattr(clause, 'is_select', False)
+                and has_request_context() and g.get('db_replica_reads')):
+            replica = self.info.get('replica')
+            if replica is None:
+                replica = self.info['replica'] = random.choice(replica_keys(self._db.engines) or [''])
+            if replica:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _committed(session):
+    if session.info.pop('wrote', False) and has_request_context() \
+            and replica_keys(current_app.config.get('SQLALCHEMY_BINDS') or {}):
+        pin_to_primary()
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop('wrote', None)
@@ -3,9 +3,16 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from cache import Cache
+from pubsub import PubSub
+from passwords import PasswordHasher
+from db_routing import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
-limiter = Limiter(key_func=get_remote_address) 
\ No newline at end of file
+limiter = Limiter(key_func=get_remote_address) 
+cache = Cache()
+pubsub = PubSub()
+passwords = PasswordHasher()
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""Delete uploaded media nothing refers to any more.
+
+Removes post media blobs whose reference count dropped to zero, blobs the
+store holds without a media_blob row, avatar renditions no user points to,
+resumable uploads left unfinished or unclaimed for a day, and avatar job
+rows older than an hour. Anything touched within the grace period is kept
+so uploads in flight are never collected. Run it periodically, e.g. from
+cron:
+
+    python gc_media.py [grace hours, default 1]
+"""
+import sys
+from datetime import timedelta
+from app import create_app
+from media_store import media_store
+from image_worker import collect_avatar_garbage, expire_avatar_jobs
+from api.profile import UPLOAD_FOLDER
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    app = create_app()
+    with app.app_context():
+        uploads = media_store.expire_uploads()
+        blobs = media_store.collect_garbage(timedelta(hours=hours))
+        avatars = collect_avatar_garbage(UPLOAD_FOLDER, hours * 3600)
+        jobs = expire_avatar_jobs()
+        print(f'Deleted {uploads} stale uploads, {len(blobs)} media blobs, {len(avatars)} avatar files '
+              f'and {jobs} avatar jobs')
@@ -0,0 +1,13 @@
+"""gunicorn settings, loaded with `gunicorn -c gunicorn.conf.py main:app`.
+
+Message streams (/api/messages/stream) hold a thread for as long as the
+client is connected, so workers are threaded: each of WEB_CONCURRENCY
+processes serves WEB_THREADS requests at once. SSE_MAX_CONNECTIONS is kept
+below WEB_THREADS (see config.py) so streams always leave threads free for
+ordinary requests.
+"""
+import os
+
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('WEB_THREADS', 32))
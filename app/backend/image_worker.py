@@ -0,0 +1,161 @@
+"""Background processing for uploaded profile images.
+
+Decoding and resizing with PIL is CPU-bound, so it runs in a process pool
+instead of the request thread. The upload request only writes the raw file
+to disk and returns a job id; when the worker finishes, the user's avatar is
+updated and the job's avatar_job row (in the database, so any gunicorn
+worker can answer a status request) becomes "done".
+
+IMAGE_PROCESSING_MODE=inline processes in the request thread instead, which
+is handy for debugging and for comparing the two in benchmarks.
+
+Each avatar is written as a set of renditions: every size in
+RENDITION_SIZES as JPEG, plus WebP and AVIF when this Pillow build can
+encode them. `{basename}.jpg` is the 400px JPEG and is what User.avatar
+points to; the rest are `{basename}_{size}.{ext}` and are picked by
+serve_profile_image from the Accept header and ?size=.
+
+The basename is the SHA-256 of the uploaded file, so uploading the same
+image twice reuses the existing renditions. Renditions no user points to
+any more are removed by collect_avatar_garbage() (see gc_media.py).
+"""
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from PIL import Image
+from extensions import db
+from models.media import AvatarJob
+from models.user import User
+from user_cache import user_cache
+from versions import bump
+
+try:
+    import pillow_avif  # noqa: F401 - registers AVIF support on older Pillow
+except ImportError:
+    pass
+
+RENDITION_SIZES = (400, 128, 48)  # largest first, each one is resized from the previous
+DEFAULT_SIZE = 400
+JOB_TTL = 3600  # seconds a finished job's status stays readable
+HASHED_NAME = re.compile(r'^([0-9a-f]{64})(_\d+)?\.\w+$')
+
+FORMATS = {
+    'avif': ('AVIF', {'quality': 60}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+def available_formats():
+    Image.init()
+    return [ext for ext, (name, _) in FORMATS.items() if name in Image.SAVE]
+
+def rendition_name(basename, size, ext):
+    if size == DEFAULT_SIZE and ext == 'jpg':
+        return f'{basename}.jpg'
+    return f'{basename}_{size}.{ext}'
+
+_executor = None
+_executor_pid = None
+
+def get_executor(workers):
+    # One pool per gunicorn worker process, created on first use. Its processes are not forked
+    # from the (threaded) web worker: a fork while another thread holds a lock can deadlock them
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        _executor_pid = os.getpid()
+    return _executor
+
+def process_avatar(source, folder, basename):
+    """Runs in a worker process: decode once and write every rendition. Returns the main file name."""
+    formats = available_formats()
+    with Image.open(source) as image:
+        image = image.convert('RGB')
+        for size in RENDITION_SIZES:
+            image.thumbnail((size, size))
+            for ext in formats:
+                name, options = FORMATS[ext]
+                image.save(os.path.join(folder, rendition_name(basename, size, ext)), format=name, **options)
+    return rendition_name(basename, DEFAULT_SIZE, 'jpg')
+
+def job_status(job_id):
+    job = db.session.get(AvatarJob, job_id)
+    return job.to_dict() if job else None
+
+def set_job_status(job_id, status, **fields):
+    AvatarJob.query.filter_by(id=job_id).update(dict(fields, status=status))
+    db.session.commit()
+
+def expire_avatar_jobs(ttl=JOB_TTL):
+    """Delete job rows last updated more than ttl seconds ago. Returns how many."""
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    deleted = AvatarJob.query.filter(AvatarJob.updated_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def submit_avatar(app, user_id, source, folder, basename):
+    """Queue processing of a saved upload and return the job id."""
+    job_id = uuid.uuid4().hex
+    db.session.add(AvatarJob(id=job_id, user_id=user_id, status='pending'))
+    db.session.commit()
+    if app.config.get('IMAGE_PROCESSING_MODE') == 'inline':
+        future = Future()
+        try:
+            future.set_result(process_avatar(source, folder, basename))
+        except Exception as e:
+            future.set_exception(e)
+        finish_avatar(app, job_id, user_id, source, future)
+    else:
+        future = get_executor(app.config.get('IMAGE_WORKERS')).submit(process_avatar, source, folder, basename)
+        future.add_done_callback(lambda f: finish_avatar(app, job_id, user_id, source, f))
+    return job_id
+
+def finish_avatar(app, job_id, user_id, source, future):
+    # Runs in the executor's callback thread, which swallows exceptions, so every failure
+    # has to end up in the job row or the client polls a pending job forever
+    with app.app_context():
+        try:
+            filename = future.result()
+            user = User.query.get(user_id)
+            if user is None:
+                raise LookupError(f'User {user_id} no longer exists')
+            user.avatar = f'/profile_images/{filename}'
+            bump('user')
+            set_job_status(job_id, 'done', avatar=user.avatar)
+        except Exception as e:
+            print('DEBUG: Avatar processing failed:', e)
+            db.session.rollback()
+            set_job_status(job_id, 'failed', error='Could not process image')
+            return
+        finally:
+            if os.path.exists(source):
+                os.remove(source)
+        user_cache.invalidate(user_id)
+
+def collect_avatar_garbage(folder, grace=3600):
+    """Delete hash-named renditions no User.avatar refers to, and stale raw uploads. Returns the deleted names."""
+    in_use = set()
+    for avatar, in db.session.query(User.avatar).filter(User.avatar.isnot(None)):
+        match = HASHED_NAME.match(os.path.basename(avatar))
+        if match:
+            in_use.add(match.group(1))
+    cutoff = time.time() - grace
+    deleted = []
+    incoming = os.path.join(folder, 'incoming')
+    candidates = [(folder, name) for name in os.listdir(folder)]
+    if os.path.isdir(incoming):
+        candidates += [(incoming, name) for name in os.listdir(incoming)]
+    for directory, name in candidates:
+        path = os.path.join(directory, name)
+        match = HASHED_NAME.match(name)
+        if directory == folder and (not match or match.group(1) in in_use):
+            continue
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            deleted.append(name)
+    return deleted
@@ -0,0 +1,328 @@
+"""Content-addressed, deduplicated storage for uploaded media.
+
+Uploads are streamed to a temp file in chunks while being hashed, then
+stored under "<sha256>.<ext>". Identical files are stored once: each
+media_blob row counts the references to a blob, put() adds one and
+release() drops one. Nothing is deleted inline; collect_garbage() removes
+blobs that have had no references for a grace period, plus files the
+backend holds with no row at all (e.g. left by a crash mid-upload).
+
+Large files can also be sent in pieces: start_upload() opens a resumable
+upload, append_upload() writes each request body to a partial file under
+MEDIA_UPLOAD_DIR (checking the size and the file type's magic bytes as it
+goes), and the finished file becomes a blob like any other.
+
+MEDIA_STORE_BACKEND picks where blobs live:
+
+- local: files under MEDIA_STORE_DIR, fanned out by the first two hex digits
+- s3:    a bucket on any S3-compatible server (AWS, or MinIO/moto locally
+         via MEDIA_S3_ENDPOINT_URL); needs `boto3`
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.media import MediaBlob, MediaUpload
+
+CHUNK_SIZE = 64 * 1024
+MEDIA_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+# Leading bytes each allowed extension must start with (offset, bytes); any one match is enough
+MAGIC_NUMBERS = {
+    'png': [(0, b'\x89PNG\r\n\x1a\n')],
+    'jpg': [(0, b'\xff\xd8\xff')],
+    'jpeg': [(0, b'\xff\xd8\xff')],
+    'gif': [(0, b'GIF87a'), (0, b'GIF89a')],
+    'mp4': [(4, b'ftyp')],
+    'mov': [(4, b'ftyp'), (4, b'moov'), (4, b'mdat'), (4, b'wide'), (4, b'free')],
+    'avi': [(8, b'AVI ')],
+}
+SNIFF_BYTES = 12
+MAX_OPEN_UPLOADS = 256  # in-progress upload hashes kept per process
+
+class FileTooLarge(Exception):
+    pass
+
+class InvalidMedia(Exception):
+    pass
+
+def sniff(ext, head):
+    return any(head[offset:offset + len(magic)] == magic for offset, magic in MAGIC_NUMBERS.get(ext.lower(), ()))
+
+def read_exactly(stream, size):
+    """Read size bytes unless the stream ends first."""
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def write_hashed(stream, path, max_size=None, chunk_size=CHUNK_SIZE):
+    """Copy stream to path chunk by chunk. Returns (sha256 hex, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as out:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise FileTooLarge(f'File larger than {max_size} bytes')
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest(), size
+
+class LocalBackend:
+    local = True
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def save(self, key, temp_path):
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        os.replace(temp_path, self.path(key))
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        """Yield (key, last modified datetime) for every stored blob."""
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.tmp'):
+                    mtime = os.path.getmtime(os.path.join(directory, name))
+                    yield name, datetime.utcfromtimestamp(mtime)
+
+class S3Backend:
+    local = False
+
+    def __init__(self, bucket, endpoint_url=None, prefix='media/'):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("MEDIA_STORE_BACKEND=s3 needs the 'boto3' package installed")
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def save(self, key, temp_path):
+        self.client.upload_file(temp_path, self.bucket, self.prefix + key)
+        os.remove(temp_path)
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def keys(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['LastModified'].replace(tzinfo=None)
+
+class MediaStore:
+    def __init__(self):
+        self.backend = None
+        self.temp_dir = None
+        self.upload_dir = None
+        # upload id -> (bytes hashed, sha256 so far), so a chunk only hashes its own bytes
+        self._upload_hashes = OrderedDict()
+
+    def init_app(self, app):
+        if app.config.get('MEDIA_STORE_BACKEND', 'local') == 's3':
+            self.backend = S3Backend(app.config['MEDIA_S3_BUCKET'], app.config.get('MEDIA_S3_ENDPOINT_URL'))
+            self.temp_dir = None
+        else:
+            self.backend = LocalBackend(app.config['MEDIA_STORE_DIR'])
+            # Same filesystem as the store so the final move is a rename
+            self.temp_dir = app.config['MEDIA_STORE_DIR']
+        self.upload_dir = app.config.get('MEDIA_UPLOAD_DIR') or os.path.join(app.config['MEDIA_STORE_DIR'], 'uploads')
+        os.makedirs(self.upload_dir, exist_ok=True)
+        app.extensions['media_store'] = self
+
+    def put(self, stream, ext, max_size=None):
+        """Store a stream and add a reference to it. Returns the blob key; the caller commits."""
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.temp_dir)
+        os.close(fd)
+        try:
+            digest, size = write_hashed(stream, temp_path, max_size)
+            return self.put_file(temp_path, digest, size, ext)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def put_file(self, path, digest, size, ext):
+        """Move an already hashed file into the store and add a reference to it."""
+        key = f'{digest}.{ext.lower()}'
+        if self._add_reference(key):
+            if not self.backend.exists(key):
+                self.backend.save(key, path)
+            else:
+                os.remove(path)
+            return key
+        self.backend.save(key, path)
+        try:
+            with db.session.begin_nested():
+                db.session.add(MediaBlob(key=key, size=size, ref_count=1))
+        except IntegrityError:
+            # Someone stored the same file at the same moment
+            self._add_reference(key)
+        return key
+
+    def _add_reference(self, key):
+        return MediaBlob.query.filter_by(key=key).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count + 1, MediaBlob.updated_at: datetime.utcnow()})
+
+    def release(self, key):
+        """Drop one reference; the blob is removed later by collect_garbage()."""
+        MediaBlob.query.filter_by(key=key).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count - 1, MediaBlob.updated_at: datetime.utcnow()})
+
+    def open(self, key):
+        return self.backend.open(key)
+
+    def local_path(self, key, workdir):
+        """A filesystem path for a blob, downloading it into workdir if the backend is remote."""
+        if self.backend.local:
+            return self.backend.path(key)
+        path = os.path.join(workdir, key)
+        with self.backend.open(key) as src, open(path, 'wb') as out:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
+        return path
+
+    def upload_path(self, upload_id):
+        return os.path.join(self.upload_dir, f'{upload_id}.part')
+
+    def start_upload(self, user_id, ext, size):
+        upload = MediaUpload(id=uuid.uuid4().hex, user_id=user_id, ext=ext.lower(), size=size, received=0)
+        open(self.upload_path(upload.id), 'wb').close()
+        db.session.add(upload)
+        return upload
+
+    def _upload_hash(self, upload, path):
+        state = self._upload_hashes.pop(upload.id, None)
+        if state is not None and state[0] == upload.received:
+            return state[1]
+        # Resumed on another worker or after a restart: re-hash what is on disk
+        digest = hashlib.sha256()
+        remaining = upload.received
+        with open(path, 'rb') as f:
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest
+
+    def append_upload(self, upload, stream):
+        """Write a request body to an upload at upload.received, chunk by chunk.
+
+        Progress is recorded on the upload even if the client disconnects
+        half way, so it can resume from there. Raises FileTooLarge as soon
+        as the data runs past the declared size and InvalidMedia if the
+        first bytes do not match the file type (checked as soon as enough of
+        them have arrived, in this request or a later one). Once every byte has arrived
+        the file is moved into the store and upload.media_key is set; the
+        caller commits.
+        """
+        path = self.upload_path(upload.id)
+        digest = self._upload_hash(upload, path)
+        received = upload.received
+        try:
+            with open(path, 'r+b') as out:
+                out.seek(received)
+                out.truncate()
+                sniff_size = min(SNIFF_BYTES, upload.size)
+                if received < sniff_size:
+                    # The first chunks may be shorter than the magic number; check it once it is all here
+                    head = read_exactly(stream, sniff_size - received)
+                    out.write(head)
+                    digest.update(head)
+                    received += len(head)
+                    if received == sniff_size:
+                        out.seek(0)
+                        if not sniff(upload.ext, out.read(sniff_size)):
+                            raise InvalidMedia(f'File content is not a valid .{upload.ext} file')
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    if received + len(chunk) > upload.size:
+                        raise FileTooLarge(f'Upload is larger than the declared {upload.size} bytes')
+                    out.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+        finally:
+            upload.received = received
+            self._upload_hashes[upload.id] = (received, digest)
+            if len(self._upload_hashes) > MAX_OPEN_UPLOADS:
+                self._upload_hashes.popitem(last=False)
+        if received == upload.size:
+            self._upload_hashes.pop(upload.id, None)
+            upload.media_key = self.put_file(path, digest.hexdigest(), upload.size, upload.ext)
+        return received
+
+    def abort_upload(self, upload):
+        self._upload_hashes.pop(upload.id, None)
+        if upload.media_key:
+            self.release(upload.media_key)
+        path = self.upload_path(upload.id)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(upload)
+
+    def expire_uploads(self, grace=timedelta(days=1)):
+        """Abort uploads (finished or not) no post has claimed within grace. Returns how many."""
+        cutoff = datetime.utcnow() - grace
+        expired = MediaUpload.query.filter(MediaUpload.updated_at < cutoff).all()
+        for upload in expired:
+            self.abort_upload(upload)
+        db.session.commit()
+        return len(expired)
+
+    def collect_garbage(self, grace=timedelta(hours=1)):
+        """Delete unreferenced and orphaned blobs older than grace. Returns the deleted keys."""
+        cutoff = datetime.utcnow() - grace
+        deleted = []
+        for blob in MediaBlob.query.filter(MediaBlob.ref_count <= 0, MediaBlob.updated_at < cutoff).all():
+            # Re-check in the DELETE so a concurrent put() that revived the blob wins
+            if MediaBlob.query.filter(MediaBlob.key == blob.key, MediaBlob.ref_count <= 0).delete():
+                db.session.commit()
+                self.backend.delete(blob.key)
+                deleted.append(blob.key)
+        known = {key for key, in db.session.query(MediaBlob.key)}
+        for key, modified in list(self.backend.keys()):
+            if MEDIA_KEY_PATTERN.match(key) and key not in known and modified < cutoff:
+                self.backend.delete(key)
+                deleted.append(key)
+        return deleted
+
+media_store = MediaStore()
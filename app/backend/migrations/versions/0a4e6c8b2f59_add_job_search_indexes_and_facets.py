@@ -0,0 +1,88 @@
+"""Add job search indexes and precomputed job facets
+
+Revision ID: 0a4e6c8b2f59
+Revises: f2d6b8c4e317
+Create Date: 2025-07-18 14:12:55.730418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a4e6c8b2f59'
+down_revision = 'f2d6b8c4e317'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS job_fts USING fts5("
+    "title, description, content='job', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS job_fts_ai AFTER INSERT ON job BEGIN "
+    "INSERT INTO job_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS job_fts_ad AFTER DELETE ON job BEGIN "
+    "INSERT INTO job_fts(job_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS job_fts_au AFTER UPDATE OF title, description ON job BEGIN "
+    "INSERT INTO job_fts(job_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO job_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    existing_indexes = [ix['name'] for ix in sa.inspect(bind).get_indexes('job')]
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        for name, columns in (('ix_job_posted_at_id', ['posted_at', 'id']),
+                              ('ix_job_company_posted_at_id', ['company', 'posted_at', 'id']),
+                              ('ix_job_location_posted_at_id', ['location', 'posted_at', 'id'])):
+            if name not in existing_indexes:
+                batch_op.create_index(name, columns, unique=False)
+
+    if dialect == 'mysql' and 'ix_job_fulltext' not in existing_indexes:
+        op.create_index('ix_job_fulltext', 'job', ['title', 'description'], unique=False, mysql_prefix='FULLTEXT')
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX IF NOT EXISTS ix_job_tsv ON job USING gin "
+                   "(to_tsvector('english'::regconfig, title || ' ' || description))")
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO job_fts(job_fts) VALUES ('rebuild')")
+
+    # The app calls db.create_all() on startup, so the table may already exist
+    if 'job_facet' not in sa.inspect(bind).get_table_names():
+        op.create_table('job_facet',
+        sa.Column('facet', sa.String(length=16), nullable=False),
+        sa.Column('value', sa.String(length=128), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('facet', 'value')
+        )
+        with op.batch_alter_table('job_facet', schema=None) as batch_op:
+            batch_op.create_index('ix_job_facet_facet_count', ['facet', 'count'], unique=False)
+
+    op.execute('DELETE FROM job_facet')
+    for facet in ('company', 'location'):
+        op.execute(f"INSERT INTO job_facet (facet, value, count) "
+                   f"SELECT '{facet}', {facet}, COUNT(*) FROM job WHERE {facet} IS NOT NULL GROUP BY {facet}")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    with op.batch_alter_table('job_facet', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_facet_facet_count')
+
+    op.drop_table('job_facet')
+    if dialect == 'mysql':
+        op.drop_index('ix_job_fulltext', table_name='job')
+    elif dialect == 'postgresql':
+        op.drop_index('ix_job_tsv', table_name='job')
+    elif dialect == 'sqlite':
+        for trigger in ('job_fts_au', 'job_fts_ad', 'job_fts_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS job_fts')
+
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_location_posted_at_id')
+        batch_op.drop_index('ix_job_company_posted_at_id')
+        batch_op.drop_index('ix_job_posted_at_id')
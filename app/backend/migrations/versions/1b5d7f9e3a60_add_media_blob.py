@@ -0,0 +1,39 @@
+"""Add media_blob for content-addressed post media
+
+Revision ID: 1b5d7f9e3a60
+Revises: 0a4e6c8b2f59
+Create Date: 2025-07-21 10:04:37.215806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b5d7f9e3a60'
+down_revision = '0a4e6c8b2f59'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so the table may already exist
+    if 'media_blob' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('media_blob',
+    sa.Column('key', sa.String(length=80), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('media_blob', schema=None) as batch_op:
+        batch_op.create_index('ix_media_blob_ref_count_updated_at', ['ref_count', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('media_blob', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_blob_ref_count_updated_at')
+
+    op.drop_table('media_blob')
@@ -0,0 +1,43 @@
+"""Add media_upload for resumable post media uploads
+
+Revision ID: 2c6e8a0f4b71
+Revises: 1b5d7f9e3a60
+Create Date: 2025-07-22 16:48:09.502331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c6e8a0f4b71'
+down_revision = '1b5d7f9e3a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so the table may already exist
+    if 'media_upload' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('media_upload',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('ext', sa.String(length=8), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('received', sa.BigInteger(), nullable=False),
+    sa.Column('media_key', sa.String(length=80), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_upload', schema=None) as batch_op:
+        batch_op.create_index('ix_media_upload_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('media_upload', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_upload_updated_at')
+
+    op.drop_table('media_upload')
@@ -0,0 +1,55 @@
+"""Add transcode_job queue and video renditions to post
+
+Revision ID: 3d7f9b1a5c82
+Revises: 2c6e8a0f4b71
+Create Date: 2025-07-24 11:26:51.804127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7f9b1a5c82'
+down_revision = '2c6e8a0f4b71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # The app calls db.create_all() on startup, so the columns and table may already exist
+    columns = [c['name'] for c in inspector.get_columns('post')]
+    if 'video_url' not in columns:
+        with op.batch_alter_table('post', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('video_url', sa.String(length=256), nullable=True))
+            batch_op.add_column(sa.Column('poster_url', sa.String(length=256), nullable=True))
+
+    if 'transcode_job' not in inspector.get_table_names():
+        op.create_table('transcode_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('source_key', sa.String(length=80), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(length=512), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('transcode_job', schema=None) as batch_op:
+            batch_op.create_index('ix_transcode_job_status_id', ['status', 'id'], unique=False)
+            batch_op.create_index('ix_transcode_job_post_id', ['post_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transcode_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_transcode_job_post_id')
+        batch_op.drop_index('ix_transcode_job_status_id')
+
+    op.drop_table('transcode_job')
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('poster_url')
+        batch_op.drop_column('video_url')
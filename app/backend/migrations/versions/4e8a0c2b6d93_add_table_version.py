@@ -0,0 +1,36 @@
+"""Add table_version counters for conditional GETs
+
+Revision ID: 4e8a0c2b6d93
+Revises: 3d7f9b1a5c82
+Create Date: 2025-07-28 09:37:14.660218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a0c2b6d93'
+down_revision = '3d7f9b1a5c82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so the table may already exist
+    if 'table_version' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    table_version = op.create_table('table_version',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_version, [
+        {'name': 'post', 'version': 1, 'updated_at': None},
+        {'name': 'user', 'version': 1, 'updated_at': None},
+    ])
+
+
+def downgrade():
+    op.drop_table('table_version')
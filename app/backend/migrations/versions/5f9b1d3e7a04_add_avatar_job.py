@@ -0,0 +1,42 @@
+"""Add avatar_job for profile image processing status
+
+Revision ID: 5f9b1d3e7a04
+Revises: 4e8a0c2b6d93
+Create Date: 2025-07-30 11:02:48.193522
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f9b1d3e7a04'
+down_revision = '4e8a0c2b6d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so the table may already exist
+    if 'avatar_job' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('avatar_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('avatar', sa.String(length=256), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('avatar_job', schema=None) as batch_op:
+        batch_op.create_index('ix_avatar_job_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('avatar_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_avatar_job_updated_at')
+
+    op.drop_table('avatar_job')
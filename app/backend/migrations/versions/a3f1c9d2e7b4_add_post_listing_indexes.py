@@ -0,0 +1,36 @@
+"""Add composite indexes for post listing filters and sorts
+
+Revision ID: a3f1c9d2e7b4
+Revises: 5501d4c2adf1
+Create Date: 2025-07-14 10:02:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e7b4'
+down_revision = '5501d4c2adf1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_visibility_created_at_id', ['visibility', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_category_created_at_id', ['category', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_user_id_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_likes_count_id', ['likes_count', 'id'], unique=False)
+        batch_op.create_index('ix_post_views_count_id', ['views_count', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_views_count_id')
+        batch_op.drop_index('ix_post_likes_count_id')
+        batch_op.drop_index('ix_post_user_id_created_at_id')
+        batch_op.drop_index('ix_post_category_created_at_id')
+        batch_op.drop_index('ix_post_visibility_created_at_id')
+        batch_op.drop_index('ix_post_created_at_id')
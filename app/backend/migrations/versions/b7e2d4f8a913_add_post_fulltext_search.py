@@ -0,0 +1,54 @@
+"""Add full-text search index on post content
+
+Revision ID: b7e2d4f8a913
+Revises: a3f1c9d2e7b4
+Create Date: 2025-07-14 15:37:09.554120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f8a913'
+down_revision = 'a3f1c9d2e7b4'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+    "content, content='post', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN "
+    "INSERT INTO post_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN "
+    "INSERT INTO post_fts(post_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF content ON post BEGIN "
+    "INSERT INTO post_fts(post_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO post_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.create_index('ix_post_content_fulltext', 'post', ['content'], unique=False, mysql_prefix='FULLTEXT')
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX ix_post_content_tsv ON post USING gin (to_tsvector('english'::regconfig, content))")
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        # Backfill existing posts into the index
+        op.execute("INSERT INTO post_fts(post_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ix_post_content_fulltext', table_name='post')
+    elif dialect == 'postgresql':
+        op.drop_index('ix_post_content_tsv', table_name='post')
+    elif dialect == 'sqlite':
+        for trigger in ('post_fts_au', 'post_fts_ad', 'post_fts_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS post_fts')
@@ -0,0 +1,66 @@
+"""Add normalized tag and post_tag tables, backfilled from post.tags
+
+Revision ID: c4a8e1b6d205
+Revises: b7e2d4f8a913
+Create Date: 2025-07-15 11:20:46.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8e1b6d205'
+down_revision = 'b7e2d4f8a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # The app calls db.create_all() on startup, so the tables may already exist
+    existing = sa.inspect(bind).get_table_names()
+    if 'tag' not in existing:
+        op.create_table('tag',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+    if 'post_tag' not in existing:
+        op.create_table('post_tag',
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+        sa.PrimaryKeyConstraint('tag_id', 'post_id')
+        )
+        with op.batch_alter_table('post_tag', schema=None) as batch_op:
+            batch_op.create_index('ix_post_tag_post_id', ['post_id'], unique=False)
+
+    # Backfill from the JSON column, normalized the same way as Tag.normalize
+    post = sa.table('post', sa.column('id', sa.Integer), sa.column('tags', sa.JSON))
+    tag = sa.table('tag', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    post_tag = sa.table('post_tag', sa.column('tag_id', sa.Integer), sa.column('post_id', sa.Integer))
+    if bind.execute(sa.select(sa.func.count()).select_from(post_tag)).scalar():
+        return
+    links = set()
+    names = set()
+    for post_id, tags in bind.execute(sa.select(post.c.id, post.c.tags).where(post.c.tags.isnot(None))):
+        for name in tags or []:
+            name = str(name).strip().lstrip('#').lower()[:64]
+            if name:
+                names.add(name)
+                links.add((post_id, name))
+    if names:
+        op.bulk_insert(tag, [{'name': name} for name in sorted(names)])
+        tag_ids = dict((name, tag_id) for tag_id, name in bind.execute(sa.select(tag.c.id, tag.c.name)))
+        op.bulk_insert(post_tag, [{'post_id': post_id, 'tag_id': tag_ids[name]} for post_id, name in sorted(links)])
+
+
+def downgrade():
+    with op.batch_alter_table('post_tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_tag_post_id')
+
+    op.drop_table('post_tag')
+    op.drop_table('tag')
@@ -0,0 +1,34 @@
+"""Add incrementally maintained post_count to tag
+
+Revision ID: d9b3f5a1c862
+Revises: c4a8e1b6d205
+Create Date: 2025-07-15 17:48:12.271930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b3f5a1c862'
+down_revision = 'c4a8e1b6d205'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so a fresh tag table already has the column
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('tag')]
+    if 'post_count' not in columns:
+        with op.batch_alter_table('tag', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('post_count', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.create_index('ix_tag_post_count_id', ['post_count', 'id'], unique=False)
+
+    op.execute('UPDATE tag SET post_count = '
+               '(SELECT COUNT(*) FROM post_tag WHERE post_tag.tag_id = tag.id)')
+
+
+def downgrade():
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_tag_post_count_id')
+        batch_op.drop_column('post_count')
@@ -0,0 +1,66 @@
+"""Add follow and timeline_entry tables and user.follower_count
+
+Revision ID: e5c7a9b3d104
+Revises: d9b3f5a1c862
+Create Date: 2025-07-16 12:05:33.418862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c7a9b3d104'
+down_revision = 'd9b3f5a1c862'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so the tables may already exist
+    inspector = sa.inspect(op.get_bind())
+    existing = inspector.get_table_names()
+    if 'follow' not in existing:
+        op.create_table('follow',
+        sa.Column('follower_id', sa.Integer(), nullable=False),
+        sa.Column('followee_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['followee_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('follower_id', 'followee_id')
+        )
+        with op.batch_alter_table('follow', schema=None) as batch_op:
+            batch_op.create_index('ix_follow_followee_id_follower_id', ['followee_id', 'follower_id'], unique=False)
+
+    if 'timeline_entry' not in existing:
+        op.create_table('timeline_entry',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'post_id')
+        )
+        with op.batch_alter_table('timeline_entry', schema=None) as batch_op:
+            batch_op.create_index('ix_timeline_entry_user_id_created_at_post_id', ['user_id', 'created_at', 'post_id'], unique=False)
+            batch_op.create_index('ix_timeline_entry_post_id', ['post_id'], unique=False)
+
+    if 'follower_count' not in [c['name'] for c in inspector.get_columns('user')]:
+        with op.batch_alter_table('user', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('follower_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('follower_count')
+
+    with op.batch_alter_table('timeline_entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_timeline_entry_post_id')
+        batch_op.drop_index('ix_timeline_entry_user_id_created_at_post_id')
+
+    op.drop_table('timeline_entry')
+    with op.batch_alter_table('follow', schema=None) as batch_op:
+        batch_op.drop_index('ix_follow_followee_id_follower_id')
+
+    op.drop_table('follow')
@@ -0,0 +1,108 @@
+"""Add conversation tables and index messages by conversation
+
+Revision ID: f2d6b8c4e317
+Revises: e5c7a9b3d104
+Create Date: 2025-07-17 09:41:27.663051
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d6b8c4e317'
+down_revision = 'e5c7a9b3d104'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app calls db.create_all() on startup, so the tables may already exist
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = inspector.get_table_names()
+    if 'conversation' not in existing:
+        op.create_table('conversation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_a_id', sa.Integer(), nullable=False),
+        sa.Column('user_b_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('last_sender_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_preview', sa.String(length=200), nullable=True),
+        sa.ForeignKeyConstraint(['user_a_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['user_b_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_a_id', 'user_b_id', name='uq_conversation_users')
+        )
+    if 'conversation_member' not in existing:
+        op.create_table('conversation_member',
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('other_user_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation.id'], ),
+        sa.ForeignKeyConstraint(['other_user_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('conversation_id', 'user_id')
+        )
+        with op.batch_alter_table('conversation_member', schema=None) as batch_op:
+            batch_op.create_index('ix_conversation_member_user_id_last_message_at', ['user_id', 'last_message_at', 'conversation_id'], unique=False)
+    if 'conversation_id' not in [c['name'] for c in inspector.get_columns('message')]:
+        with op.batch_alter_table('message', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('conversation_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_message_conversation_id', 'conversation', ['conversation_id'], ['id'])
+            batch_op.create_index('ix_message_conversation_id_timestamp_id', ['conversation_id', 'timestamp', 'id'], unique=False)
+
+    # Backfill conversations for existing messages
+    message = sa.table('message', sa.column('id', sa.Integer), sa.column('conversation_id', sa.Integer),
+                       sa.column('sender_id', sa.Integer), sa.column('receiver_id', sa.Integer),
+                       sa.column('content', sa.Text), sa.column('timestamp', sa.DateTime))
+    conversation = sa.table('conversation', sa.column('id', sa.Integer),
+                            sa.column('user_a_id', sa.Integer), sa.column('user_b_id', sa.Integer),
+                            sa.column('last_message_id', sa.Integer), sa.column('last_message_at', sa.DateTime),
+                            sa.column('last_sender_id', sa.Integer), sa.column('last_message_preview', sa.String))
+    member = sa.table('conversation_member', sa.column('conversation_id', sa.Integer),
+                      sa.column('user_id', sa.Integer), sa.column('other_user_id', sa.Integer),
+                      sa.column('last_message_at', sa.DateTime))
+    latest = {}
+    rows = bind.execute(sa.select(message).where(message.c.conversation_id.is_(None))
+                        .order_by(message.c.timestamp, message.c.id))
+    for row in rows:
+        latest[tuple(sorted((row.sender_id, row.receiver_id)))] = row
+    for (user_a_id, user_b_id), last in latest.items():
+        conversation_id = bind.execute(sa.select(conversation.c.id).where(
+            conversation.c.user_a_id == user_a_id, conversation.c.user_b_id == user_b_id)).scalar()
+        if conversation_id is None:
+            bind.execute(conversation.insert().values(user_a_id=user_a_id, user_b_id=user_b_id))
+            conversation_id = bind.execute(sa.select(conversation.c.id).where(
+                conversation.c.user_a_id == user_a_id, conversation.c.user_b_id == user_b_id)).scalar()
+            op.bulk_insert(member, [
+                {'conversation_id': conversation_id, 'user_id': user_a_id, 'other_user_id': user_b_id},
+                {'conversation_id': conversation_id, 'user_id': user_b_id, 'other_user_id': user_a_id},
+            ])
+        bind.execute(conversation.update().where(conversation.c.id == conversation_id).values(
+            last_message_id=last.id, last_message_at=last.timestamp,
+            last_sender_id=last.sender_id, last_message_preview=last.content[:200]))
+        bind.execute(member.update().where(member.c.conversation_id == conversation_id).values(
+            last_message_at=last.timestamp))
+        bind.execute(message.update().where(
+            message.c.conversation_id.is_(None),
+            sa.or_(sa.and_(message.c.sender_id == user_a_id, message.c.receiver_id == user_b_id),
+                   sa.and_(message.c.sender_id == user_b_id, message.c.receiver_id == user_a_id))
+        ).values(conversation_id=conversation_id))
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_conversation_id_timestamp_id')
+        batch_op.drop_constraint('fk_message_conversation_id', type_='foreignkey')
+        batch_op.drop_column('conversation_id')
+
+    with op.batch_alter_table('conversation_member', schema=None) as batch_op:
+        batch_op.drop_index('ix_conversation_member_user_id_last_message_at')
+
+    op.drop_table('conversation_member')
+    op.drop_table('conversation')
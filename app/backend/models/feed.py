@@ -0,0 +1,100 @@
+from extensions import db
+from datetime import datetime
+from models.post import Post
+
+# Authors with more followers than this are not fanned out on write; their
+# posts are merged into readers' feeds at read time instead.
+FANOUT_LIMIT = 10000
+# Timelines are trimmed to this many entries by trim_timelines.py
+TIMELINE_MAX_LENGTH = 800
+
+class Follow(db.Model):
+    __table_args__ = (
+        db.Index('ix_follow_followee_id_follower_id', 'followee_id', 'follower_id'),
+    )
+
+    follower_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    followee_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Follow {self.follower_id} -> {self.followee_id}>'
+
+class TimelineEntry(db.Model):
+    """A post precomputed into one reader's home feed."""
+    __tablename__ = 'timeline_entry'
+    __table_args__ = (
+        db.Index('ix_timeline_entry_user_id_created_at_post_id', 'user_id', 'created_at', 'post_id'),
+        db.Index('ix_timeline_entry_post_id', 'post_id'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    author_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    @staticmethod
+    def fan_out(post, follower_count):
+        """Write a new post into its author's and followers' timelines."""
+        entry = {'post_id': post.id, 'author_id': post.user_id, 'created_at': post.created_at}
+        db.session.execute(TimelineEntry.__table__.insert(), [dict(entry, user_id=post.user_id)])
+        if follower_count > FANOUT_LIMIT:
+            return
+        followers = db.select(
+            Follow.follower_id,
+            db.literal(post.id),
+            db.literal(post.user_id),
+            db.literal(post.created_at),
+        ).where(Follow.followee_id == post.user_id)
+        db.session.execute(TimelineEntry.__table__.insert().from_select(
+            ['user_id', 'post_id', 'author_id', 'created_at'], followers))
+
+    @staticmethod
+    def backfill(follower_id, author_id, limit=20):
+        """Copy an author's recent public posts into a new follower's timeline."""
+        recent = (db.select(db.literal(follower_id), Post.id, Post.user_id, Post.created_at)
+                  .where(Post.user_id == author_id, Post.visibility == 'public')
+                  .order_by(Post.created_at.desc(), Post.id.desc())
+                  .limit(limit))
+        db.session.execute(TimelineEntry.__table__.insert().from_select(
+            ['user_id', 'post_id', 'author_id', 'created_at'], recent))
+
+    @staticmethod
+    def unfollow(follower_id, author_id):
+        db.session.execute(TimelineEntry.__table__.delete().where(
+            TimelineEntry.user_id == follower_id, TimelineEntry.author_id == author_id))
+
+    @staticmethod
+    def remove_post(post_id):
+        db.session.execute(TimelineEntry.__table__.delete().where(TimelineEntry.post_id == post_id))
+
+    @staticmethod
+    def trim(user_id):
+        """Drop entries beyond TIMELINE_MAX_LENGTH for one user; the caller commits."""
+        boundary = (db.session.query(TimelineEntry.created_at, TimelineEntry.post_id)
+                    .filter(TimelineEntry.user_id == user_id)
+                    .order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc())
+                    .offset(TIMELINE_MAX_LENGTH).limit(1).first())
+        if boundary is None:
+            return
+        created_at, post_id = boundary
+        # Ordered on (created_at, post_id) like the feed cursor, so rows that share the boundary's
+        # created_at but sort above it are kept
+        db.session.execute(TimelineEntry.__table__.delete().where(
+            TimelineEntry.user_id == user_id,
+            db.or_(TimelineEntry.created_at < created_at,
+                   db.and_(TimelineEntry.created_at == created_at, TimelineEntry.post_id <= post_id))))
+
+    @staticmethod
+    def trim_all():
+        """Trim every timeline that has grown past TIMELINE_MAX_LENGTH. Returns the user ids trimmed."""
+        users = [user_id for user_id, in db.session.query(TimelineEntry.user_id)
+                 .group_by(TimelineEntry.user_id)
+                 .having(db.func.count() > TIMELINE_MAX_LENGTH)]
+        for user_id in users:
+            TimelineEntry.trim(user_id)
+            db.session.commit()
+        return users
+
+    def __repr__(self):
+        return f'<TimelineEntry user {self.user_id} post {self.post_id}>'
@@ -1,7 +1,16 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy import DDL, event
+from models.post import TS_CONFIG
 
 class Job(db.Model):
+    # Recency-sorted listing, optionally narrowed to one company or location
+    __table_args__ = (
+        db.Index('ix_job_posted_at_id', 'posted_at', 'id'),
+        db.Index('ix_job_company_posted_at_id', 'company', 'posted_at', 'id'),
+        db.Index('ix_job_location_posted_at_id', 'location', 'posted_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -11,3 +20,41 @@ class Job(db.Model):
 
     def __repr__(self):
         return f'<Job {self.id} - {self.title}>'
+
+class JobFacet(db.Model):
+    """Precomputed number of jobs per company / location value."""
+    __tablename__ = 'job_facet'
+    __table_args__ = (
+        db.Index('ix_job_facet_facet_count', 'facet', 'count'),
+    )
+
+    facet = db.Column(db.String(16), primary_key=True)
+    value = db.Column(db.String(128), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<JobFacet {self.facet}={self.value}: {self.count}>'
+
+# Full-text indexes on title + description (see search.py)
+JOB_SEARCH_DOCUMENT = Job.title + ' ' + Job.description
+
+db.Index('ix_job_fulltext', Job.title, Job.description, mysql_prefix='FULLTEXT').ddl_if(dialect='mysql')
+db.Index('ix_job_tsv', db.func.to_tsvector(TS_CONFIG, JOB_SEARCH_DOCUMENT),
+         postgresql_using='gin').ddl_if(dialect='postgresql')
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS job_fts USING fts5("
+    "title, description, content='job', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS job_fts_ai AFTER INSERT ON job BEGIN "
+    "INSERT INTO job_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS job_fts_ad AFTER DELETE ON job BEGIN "
+    "INSERT INTO job_fts(job_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS job_fts_au AFTER UPDATE OF title, description ON job BEGIN "
+    "INSERT INTO job_fts(job_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO job_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(Job.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Job.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS job_fts').execute_if(dialect='sqlite'))
@@ -0,0 +1,89 @@
+from extensions import db
+from datetime import datetime
+
+class MediaBlob(db.Model):
+    """A stored media file, keyed by the SHA-256 of its content."""
+    __tablename__ = 'media_blob'
+    __table_args__ = (
+        db.Index('ix_media_blob_ref_count_updated_at', 'ref_count', 'updated_at'),
+    )
+
+    # "<sha256 hex>.<ext>"
+    key = db.Column(db.String(80), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MediaBlob {self.key} refs={self.ref_count}>'
+
+class MediaUpload(db.Model):
+    """A resumable post media upload in progress (see the /api/posts/uploads routes)."""
+    __tablename__ = 'media_upload'
+    __table_args__ = (
+        db.Index('ix_media_upload_updated_at', 'updated_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    ext = db.Column(db.String(8), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Bytes stored so far; the next chunk must start here
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    # Set once complete; holds one reference to the blob until a post takes it over
+    media_key = db.Column(db.String(80))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MediaUpload {self.id} {self.received}/{self.size}>'
+
+class TranscodeJob(db.Model):
+    """A queued video transcode for a post (see video_worker.py)."""
+    __tablename__ = 'transcode_job'
+    __table_args__ = (
+        db.Index('ix_transcode_job_status_id', 'status', 'id'),
+        db.Index('ix_transcode_job_post_id', 'post_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    source_key = db.Column(db.String(80), nullable=False)
+    # queued -> running -> done / failed; running jobs whose lease ran out go back to queued
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(512))
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TranscodeJob {self.id} post={self.post_id} {self.status}>'
+
+class AvatarJob(db.Model):
+    """Processing of an uploaded profile image (see image_worker.py)."""
+    __tablename__ = 'avatar_job'
+    __table_args__ = (
+        db.Index('ix_avatar_job_updated_at', 'updated_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # pending -> done / failed
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    avatar = db.Column(db.String(256))
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        data = {'status': self.status, 'user_id': self.user_id}
+        if self.avatar:
+            data['avatar'] = self.avatar
+        if self.error:
+            data['error'] = self.error
+        return data
+
+    def __repr__(self):
+        return f'<AvatarJob {self.id} user={self.user_id} {self.status}>'
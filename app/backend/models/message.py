@@ -1,8 +1,48 @@
 from extensions import db
 from datetime import datetime
 
+class Conversation(db.Model):
+    """A one-to-one thread, with its latest message denormalized for the inbox."""
+    __table_args__ = (
+        db.UniqueConstraint('user_a_id', 'user_b_id', name='uq_conversation_users'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Participants are stored lower id first so each pair has one row
+    user_a_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_b_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_message_id = db.Column(db.Integer)
+    last_message_at = db.Column(db.DateTime)
+    last_sender_id = db.Column(db.Integer)
+    last_message_preview = db.Column(db.String(200))
+
+    def __repr__(self):
+        return f'<Conversation {self.id} between {self.user_a_id} and {self.user_b_id}>'
+
+class ConversationMember(db.Model):
+    """One participant's view of a conversation; the inbox is a range read on this table."""
+    __tablename__ = 'conversation_member'
+    __table_args__ = (
+        db.Index('ix_conversation_member_user_id_last_message_at', 'user_id', 'last_message_at', 'conversation_id'),
+    )
+
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    other_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_message_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ConversationMember {self.user_id} in {self.conversation_id}>'
+
 class Message(db.Model):
+    __table_args__ = (
+        db.Index('ix_message_conversation_id_timestamp_id', 'conversation_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
     sender_id = db.Column(db.Integer, nullable=False)
     receiver_id = db.Column(db.Integer, nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -1,11 +1,25 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy import DDL, event
 
 class Post(db.Model):
+    # Composite indexes matching the filter/sort shapes used by list_posts
+    __table_args__ = (
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_post_visibility_created_at_id', 'visibility', 'created_at', 'id'),
+        db.Index('ix_post_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_post_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_post_likes_count_id', 'likes_count', 'id'),
+        db.Index('ix_post_views_count_id', 'views_count', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     media_url = db.Column(db.String(256))
+    # Set by the video worker once an uploaded video is transcoded
+    video_url = db.Column(db.String(256))
+    poster_url = db.Column(db.String(256))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     category = db.Column(db.String(64))
     visibility = db.Column(db.String(32), default='public')
@@ -15,3 +29,28 @@ class Post(db.Model):
 
     def __repr__(self):
         return f'<Post {self.id} by user {self.user_id}>'
+
+# Full-text indexes on post.content, one flavour per database backend (see search.py)
+TS_CONFIG = db.literal_column("'english'::regconfig")
+
+db.Index('ix_post_content_fulltext', Post.content, mysql_prefix='FULLTEXT').ddl_if(dialect='mysql')
+db.Index('ix_post_content_tsv', db.func.to_tsvector(TS_CONFIG, Post.content),
+         postgresql_using='gin').ddl_if(dialect='postgresql')
+
+# SQLite has no full-text index type, so keep an FTS5 table in sync with triggers
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+    "content, content='post', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN "
+    "INSERT INTO post_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN "
+    "INSERT INTO post_fts(post_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF content ON post BEGIN "
+    "INSERT INTO post_fts(post_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO post_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(Post.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Post.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS post_fts').execute_if(dialect='sqlite'))
@@ -0,0 +1,46 @@
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+
+# Association between posts and normalized tags. The primary key leads with
+# tag_id so "posts with tag X" is an index range scan; the second index
+# serves "tags of post Y".
+post_tag = db.Table(
+    'post_tag',
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Index('ix_post_tag_post_id', 'post_id'),
+)
+
+class Tag(db.Model):
+    # Popular tags are read straight off this index
+    __table_args__ = (
+        db.Index('ix_tag_post_count_id', 'post_count', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)
+    # Number of posts linked in post_tag, kept up to date on post create/delete
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @staticmethod
+    def normalize(name):
+        return str(name).strip().lstrip('#').lower()[:64]
+
+    @classmethod
+    def get_or_create_all(cls, names):
+        """Return Tag rows for the given (already normalized) names, creating missing ones."""
+        existing = {t.name: t for t in cls.query.filter(cls.name.in_(names)).all()} if names else {}
+        for name in names:
+            if name not in existing:
+                try:
+                    with db.session.begin_nested():
+                        existing[name] = cls(name=name)
+                        db.session.add(existing[name])
+                except IntegrityError:
+                    # A concurrent request created it since the query above; a locking
+                    # read sees its row even under MySQL's repeatable read
+                    existing[name] = cls.query.filter_by(name=name).with_for_update().one()
+        return [existing[name] for name in names]
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
@@ -12,3 +12,5 @@ class User(db.Model):
     title = db.Column(db.String(128))
     location = db.Column(db.String(128))
     education = db.Column(db.JSON)
+    # Denormalized so feed reads can tell high-fanout authors apart cheaply
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
@@ -0,0 +1,13 @@
+from extensions import db
+from datetime import datetime
+
+class TableVersion(db.Model):
+    """A counter bumped on every write to a table, used for ETags (see versions.py)."""
+    __tablename__ = 'table_version'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TableVersion {self.name}={self.version}>'
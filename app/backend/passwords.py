@@ -0,0 +1,77 @@
+"""Password hashing off the request thread, with a bounded queue.
+
+A bcrypt hash or verify takes a few hundred milliseconds of CPU. Running
+it on the request thread lets a burst of logins queue up behind each
+other without limit. Here the work runs in a pool of PASSWORD_HASH_WORKERS
+threads (bcrypt and argon2 release the GIL, so threads use every core).
+At most PASSWORD_HASH_QUEUE hashes can be running or waiting at once, and
+past that HasherBusy is raised straight away so the client gets a fast
+503 instead of a slow timeout.
+
+PASSWORD_SCHEMES lists the accepted schemes; the first one hashes new
+passwords. With "argon2,bcrypt" (needs `argon2-cffi`) new hashes are
+argon2 and bcrypt hashes still verify. verify() reports when a hash uses
+an old scheme or a different PASSWORD_BCRYPT_ROUNDS, and login then
+stores a fresh hash, so changing the cost needs no migration.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+class HasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self):
+        self.context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+        self.workers = os.cpu_count() or 1
+        self.max_queue = self.workers * 4
+        self.timeout = 30
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        schemes = [s.strip() for s in app.config.get('PASSWORD_SCHEMES', 'bcrypt').split(',') if s.strip()]
+        if 'argon2' in schemes:
+            try:
+                import argon2  # noqa: F401
+            except ImportError:
+                raise RuntimeError("PASSWORD_SCHEMES=argon2 needs the 'argon2-cffi' package installed")
+        self.context = CryptContext(schemes=schemes, deprecated='auto',
+                                    bcrypt__rounds=app.config.get('PASSWORD_BCRYPT_ROUNDS', 12))
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS') or self.workers
+        self.max_queue = app.config.get('PASSWORD_HASH_QUEUE') or self.workers * 4
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor = None
+        app.extensions['passwords'] = self
+
+    def _get_executor(self):
+        # One pool per gunicorn worker process, created on first use
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many password checks in progress, try again shortly')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.timeout)
+
+    def hash(self, password):
+        return self._run(self.context.hash, password)
+
+    def verify(self, password, password_hash):
+        """Returns (matches, new hash or None); a new hash means the stored one should be replaced."""
+        return self._run(self.context.verify_and_update, password, password_hash)
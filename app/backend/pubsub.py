@@ -0,0 +1,163 @@
+"""In-process publish/subscribe used to push events to connected clients.
+
+Subscribers are server-sent-event streams (see api/messaging.py). Each one
+gets a bounded queue; a client that stops reading fills it, gets an
+`overflow` event and is disconnected so it cannot hold memory, and is
+expected to reconnect and catch up from the history endpoint.
+
+PUBSUB_BACKEND picks the broker:
+
+- local: events only reach subscribers in the same process
+- redis: events go through Redis pub/sub so every gunicorn worker sees them
+         (needs the `redis` package)
+
+Each open stream holds a worker thread, so gunicorn runs threaded workers
+(gunicorn.conf.py). SSE_MAX_CONNECTIONS and SSE_MAX_PER_USER cap how many
+streams one process accepts; the total is kept below WEB_THREADS so open
+streams cannot take every thread and stall the rest of the API.
+"""
+import json
+import os
+import queue
+import threading
+from collections import defaultdict
+
+OVERFLOW = object()
+
+class TooManyConnections(Exception):
+    pass
+
+class Subscription:
+    def __init__(self, channel, key, maxsize):
+        self.channel = channel
+        self.key = key
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow consumer: tell it to resync rather than buffering without bound
+            self.overflowed = True
+            self.queue = queue.Queue(maxsize=1)
+            self.queue.put_nowait(OVERFLOW)
+
+    def get(self, timeout):
+        """Next event, None on timeout, or OVERFLOW."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class LocalBroker:
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, subscription):
+        with self.lock:
+            self.subscribers[subscription.channel].add(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.channel]
+
+    def dispatch(self, channel, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+
+class RedisBroker(LocalBroker):
+    def __init__(self, url, prefix='prok:events:'):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PUBSUB_BACKEND=redis needs the 'redis' package installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._listener = None
+        self._pid = None
+
+    def add(self, subscription):
+        self._ensure_listener()
+        super().add(subscription)
+
+    def _ensure_listener(self):
+        # One listener thread per worker process, (re)started after fork
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._listener is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='pubsub-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + '*')
+        for item in pubsub.listen():
+            channel = item['channel'].decode()[len(self.prefix):]
+            self.dispatch(channel, json.loads(item['data']))
+
+    def publish(self, channel, event):
+        self.client.publish(self.prefix + channel, json.dumps(event))
+
+class PubSub:
+    def __init__(self):
+        self.broker = LocalBroker()
+        self.max_connections = 500
+        self.max_per_key = 5
+        self.queue_size = 100
+        self._counts = defaultdict(int)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if app.config.get('PUBSUB_BACKEND', 'local') == 'redis':
+            self.broker = RedisBroker(app.config['PUBSUB_REDIS_URL'])
+        else:
+            self.broker = LocalBroker()
+        self.max_connections = app.config.get('SSE_MAX_CONNECTIONS', self.max_connections)
+        threads = app.config.get('WEB_THREADS')
+        if threads:
+            self.max_connections = min(self.max_connections, max(threads - 1, 1))
+        self.max_per_key = app.config.get('SSE_MAX_PER_USER', self.max_per_key)
+        self.queue_size = app.config.get('SSE_QUEUE_SIZE', self.queue_size)
+        app.extensions['pubsub'] = self
+
+    def subscribe(self, channel, key):
+        """Open a subscription counted against key (usually the user id)."""
+        with self._lock:
+            if self._total >= self.max_connections:
+                raise TooManyConnections('Too many open streams on this server')
+            if self._counts[key] >= self.max_per_key:
+                raise TooManyConnections('Too many open streams for this user')
+            self._total += 1
+            self._counts[key] += 1
+        subscription = Subscription(channel, key, self.queue_size)
+        self.broker.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.broker.remove(subscription)
+        with self._lock:
+            self._total -= 1
+            self._counts[subscription.key] -= 1
+            if not self._counts[subscription.key]:
+                del self._counts[subscription.key]
+
+    def publish(self, channel, event):
+        self.broker.publish(channel, event)
@@ -0,0 +1,41 @@
+"""Scoring for the ranked ("top") feed.
+
+Candidates are scored as whole NumPy columns rather than one Python object
+per post:
+
+    score = (1 + engagement + affinity) * 2 ** (-age_hours / HALF_LIFE_HOURS)
+
+where engagement is log-scaled likes and views, and affinity rewards posts
+in the reader's categories, sharing the reader's tags, or by followed
+authors.
+"""
+import numpy as np
+
+LIKE_WEIGHT = 1.0
+VIEW_WEIGHT = 0.2
+CATEGORY_WEIGHT = 0.5
+TAG_WEIGHT = 0.3
+MAX_TAG_MATCHES = 3
+FOLLOW_WEIGHT = 1.0
+HALF_LIFE_HOURS = 24.0
+
+def score(likes, views, age_hours, category_match, tag_matches, followed):
+    engagement = LIKE_WEIGHT * np.log1p(likes) + VIEW_WEIGHT * np.log1p(views)
+    affinity = (CATEGORY_WEIGHT * category_match
+                + TAG_WEIGHT * np.minimum(tag_matches, MAX_TAG_MATCHES)
+                + FOLLOW_WEIGHT * followed)
+    return (1.0 + engagement + affinity) * np.exp2(-age_hours / HALF_LIFE_HOURS)
+
+def count_matches(ids, matched_ids):
+    """For each id in ids, count how often it appears in matched_ids."""
+    order = np.argsort(ids)
+    matched_ids = matched_ids[np.isin(matched_ids, ids)]
+    positions = order[np.searchsorted(ids, matched_ids, sorter=order)]
+    return np.bincount(positions, minlength=len(ids))
+
+def top_k(ids, scores, k):
+    """Ids of the k best scores, best first."""
+    if len(ids) > k:
+        best = np.argpartition(-scores, k)[:k]
+        ids, scores = ids[best], scores[best]
+    return ids[np.argsort(-scores, kind='stable')].tolist()
@@ -0,0 +1,64 @@
+"""Full-text search over post content and job listings.
+
+The engine is picked from the database backend in SQLALCHEMY_DATABASE_URI
+(or forced with SEARCH_BACKEND):
+
+- mysql:      MATCH ... AGAINST on the FULLTEXT index, boolean mode
+- postgresql: to_tsvector @@ to_tsquery on the GIN index, ranked by ts_rank
+- sqlite:     FTS5 tables (post_fts, job_fts), ranked by bm25
+- ilike:      the old '%term%' scan, kept as a fallback and for benchmarks
+
+Every term must match and is prefix matched, so "pyth dev" finds
+"Python developer". Searchable models are listed in SEARCHABLE with the
+columns they search, the document expression their Postgres index is
+built on, and their SQLite FTS5 table.
+"""
+import re
+from flask import current_app
+from sqlalchemy import column, table
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.engine import make_url
+from extensions import db
+from models.post import Post, TS_CONFIG
+from models.job import Job, JOB_SEARCH_DOCUMENT
+
+BACKENDS = {'mysql', 'postgresql', 'sqlite', 'ilike'}
+MAX_TERMS = 8
+
+SEARCHABLE = {
+    Post: ([Post.content], Post.content, 'post_fts'),
+    Job: ([Job.title, Job.description], JOB_SEARCH_DOCUMENT, 'job_fts'),
+}
+
+def get_backend():
+    backend = current_app.config.get('SEARCH_BACKEND')
+    if not backend:
+        backend = make_url(current_app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    return backend if backend in BACKENDS else 'ilike'
+
+def tokenize(term):
+    return re.findall(r'\w+', term.lower())[:MAX_TERMS]
+
+def apply_search(query, term, model=Post):
+    """Filter a query on a searchable model by a search term.
+
+    Returns (query, rank) where rank is an ORDER BY clause putting the best
+    matches first, or None when the backend cannot rank.
+    """
+    columns, document, fts_name = SEARCHABLE[model]
+    backend = get_backend()
+    tokens = tokenize(term)
+    if backend == 'ilike' or not tokens:
+        return query.filter(db.or_(*[c.ilike(f'%{term}%') for c in columns])), None
+    if backend == 'mysql':
+        score = match(*columns, against=' '.join(f'+{t}*' for t in tokens)).in_boolean_mode()
+        return query.filter(score), score.desc()
+    if backend == 'postgresql':
+        vector = db.func.to_tsvector(TS_CONFIG, document)
+        tsquery = db.func.to_tsquery(TS_CONFIG, ' & '.join(f'{t}:*' for t in tokens))
+        return query.filter(vector.op('@@')(tsquery)), db.func.ts_rank(vector, tsquery).desc()
+    # sqlite: bm25 rank is negative, lower is better
+    fts = table(fts_name, column('rowid'), column('rank'))
+    fts_query = ' '.join(f'"{t}"*' for t in tokens)
+    query = query.join(fts, fts.c.rowid == model.id)
+    return query.filter(db.literal_column(fts_name).op('MATCH')(fts_query)), fts.c.rank.asc()
@@ -0,0 +1,97 @@
+"""Serving uploaded media with headers browsers and CDNs can cache on.
+
+Every file gets a strong ETag and Last-Modified, so revalidation is a 304,
+and Range requests are answered with 206 so video players can seek without
+downloading the whole file again. Content-addressed names (a SHA-256, see
+media_store.py and image_worker.py) never change content and are sent with
+`Cache-Control: immutable` and a one year max-age; older upload names get
+MEDIA_MAX_AGE and are revalidated.
+
+MEDIA_SENDFILE hands the file itself to the front server instead of
+streaming it from a Python worker:
+
+- x-sendfile:       Apache mod_xsendfile / lighttpd; sends X-Sendfile: <path>
+- x-accel-redirect: nginx; sends X-Accel-Redirect: MEDIA_ACCEL_REDIRECT_PREFIX
+                    + the path relative to the backend directory, e.g.
+
+                    location /protected-media/ { internal; alias /app/backend/; }
+
+The front server then handles Range itself.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from flask import current_app, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}(_\d+)?\.\w+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MAX_HASHED = 4096  # legacy files whose content hash is remembered per process
+
+_hashes = OrderedDict()
+
+def is_immutable(filename):
+    return bool(CONTENT_ADDRESSED.match(filename))
+
+def file_etag(path, filename):
+    """Strong ETag: the name itself when it is a content hash, otherwise the SHA-256 of the file."""
+    if is_immutable(filename):
+        return filename
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _hashes.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                sha.update(chunk)
+        digest = _hashes[key] = sha.hexdigest()
+        if len(_hashes) > MAX_HASHED:
+            _hashes.popitem(last=False)
+    else:
+        _hashes.move_to_end(key)
+    return digest
+
+def set_cache_headers(response, filename):
+    if is_immutable(filename):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get('MEDIA_MAX_AGE', 3600)
+    response.cache_control.no_cache = None
+    response.expires = None
+    return response
+
+def send_media(folder, filename):
+    """send_from_directory with strong ETags, Range support and long-lived caching."""
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    path = os.path.abspath(path)
+    etag = file_etag(path, filename)
+    mode = current_app.config.get('MEDIA_SENDFILE')
+    if not mode:
+        response = send_file(path, conditional=True, etag=etag)
+        response.accept_ranges = 'bytes'
+        return set_cache_headers(response, filename)
+
+    response = current_app.response_class(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(path, current_app.root_path).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = current_app.config['MEDIA_ACCEL_REDIRECT_PREFIX'] + relative
+    else:
+        response.headers['X-Sendfile'] = path
+    response.set_etag(etag)
+    response.last_modified = os.path.getmtime(path)
+    set_cache_headers(response, filename)
+    # No Range handling here; the front server does it when it sends the file
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        response.headers.pop('X-Accel-Redirect', None)
+        response.headers.pop('X-Sendfile', None)
+    return response
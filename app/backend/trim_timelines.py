@@ -0,0 +1,17 @@
+"""Trim home timelines back to TIMELINE_MAX_LENGTH entries.
+
+Fan-out on write only ever adds timeline rows, so readers who follow busy
+authors collect more than the feed will page through. This drops the
+oldest ones, outside the request path. Run it periodically, e.g. hourly
+from cron:
+
+    python trim_timelines.py
+"""
+from app import create_app
+from models.feed import TimelineEntry
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        users = TimelineEntry.trim_all()
+        print(f'Trimmed {len(users)} timelines')
@@ -0,0 +1,53 @@
+"""Cached lookups of the signed-in user.
+
+Registered as flask-jwt-extended's user loader, so every @jwt_required
+request checks its user exists and `current_user` is available, without a
+query per request: the row is read once per USER_CACHE_TTL seconds into
+the shared cache, and once per request at most into flask.g.
+
+The cached user is a detached, read-only User built from a dict of
+public columns (no password hash). Unknown ids are not cached, so an
+account is found as soon as its signup commits. Code that changes a user
+loads the row with User.query.get() as before and calls invalidate() after
+the commit. With the per-process memory cache other workers may see the
+old values until the TTL runs out (use CACHE_BACKEND=redis to share it),
+so it is used to authenticate requests and to look up other users, and
+GET /api/profile reads the owner's own row from the database.
+"""
+from flask import g, has_request_context
+from extensions import cache
+from models.user import User
+
+FIELDS = ('id', 'username', 'email', 'bio', 'skills', 'avatar', 'social', 'title', 'location', 'education')
+
+def cache_key(user_id):
+    return f'user:{user_id}'
+
+class UserCache:
+    def __init__(self):
+        self.ttl = 30
+
+    def init_app(self, app, jwt):
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        jwt.user_lookup_loader(lambda _header, data: self.get(data['sub']))
+        app.extensions['user_cache'] = self
+
+    def _load(self, user_id):
+        user = User.query.get(user_id)
+        return {field: getattr(user, field) for field in FIELDS} if user else None
+
+    def get(self, user_id):
+        """The user as a detached User, or None if there is no such user."""
+        user_id = int(user_id)
+        local = g.setdefault('_user_cache', {}) if has_request_context() else {}
+        if user_id not in local:
+            data = cache.get_or_set(cache_key(user_id), lambda: self._load(user_id), self.ttl)
+            local[user_id] = User(**data) if data else None
+        return local[user_id]
+
+    def invalidate(self, user_id):
+        cache.delete(cache_key(int(user_id)))
+        if has_request_context():
+            g.get('_user_cache', {}).pop(int(user_id), None)
+
+user_cache = UserCache()
@@ -0,0 +1,92 @@
+"""Conditional GETs for read-mostly endpoints, driven by table versions.
+
+Each table_version row counts the writes to one table: code that changes
+posts or users calls bump('post') / bump('user') in the same transaction.
+A view wrapped in @conditional('post', ...) gets an ETag made from the
+request path, its normalised query args and those counters, and a
+Last-Modified from when they last changed. A client (or CDN) that sends
+the ETag back in If-None-Match, or a matching If-Modified-Since, gets a
+304 after one primary key lookup on table_version, without the view
+running or the post table being read.
+
+With RESPONSE_CACHE_TIMEOUT set, response bodies are also kept in the
+shared cache under their ETag, so a client without a copy still skips the
+view. A bump changes every ETag that depends on the table, so entries never
+need deleting; old ones just expire.
+
+Post likes/views are written back by the counter flusher, which bumps
+'post_counters' (not 'post') once per flush. Only views that show the
+counts depend on it, so view traffic does not invalidate categories or
+tags. Counts in a revalidated response can be one flush interval old.
+"""
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy.exc import IntegrityError
+from werkzeug.http import is_resource_modified
+from extensions import db, cache
+from models.version import TableVersion
+
+def bump(*names):
+    """Mark tables as changed; the caller commits."""
+    now = datetime.utcnow()
+    for name in names:
+        updated = TableVersion.query.filter_by(name=name).update(
+            {TableVersion.version: TableVersion.version + 1, TableVersion.updated_at: now},
+            synchronize_session=False)
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(TableVersion(name=name, version=1, updated_at=now))
+            except IntegrityError:
+                TableVersion.query.filter_by(name=name).update(
+                    {TableVersion.version: TableVersion.version + 1, TableVersion.updated_at: now},
+                    synchronize_session=False)
+
+def get_versions(names):
+    """{name: (version, updated_at)} for the given tables, in one query."""
+    rows = (db.session.query(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+            .filter(TableVersion.name.in_(names)).all())
+    return {name: (version, updated_at) for name, version, updated_at in rows}
+
+def normalized_args():
+    return sorted((key, sorted(request.args.getlist(key))) for key in request.args)
+
+def conditional(*tables):
+    """ETag / Last-Modified / 304 for a GET view whose output only depends on the given tables."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(tables)
+            state = [request.path, normalized_args(), [versions.get(t, (0, None))[0] for t in tables]]
+            etag = hashlib.sha1(json.dumps(state).encode()).hexdigest()
+            changed = [updated_at for _, updated_at in versions.values() if updated_at]
+            last_modified = max(changed).replace(microsecond=0) if changed else None
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+                return set_validators(response, etag, last_modified)
+
+            timeout = current_app.config.get('RESPONSE_CACHE_TIMEOUT')
+            body = cache.get(f'response:{etag}') if timeout else None
+            if body is not None:
+                response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+                return set_validators(response, etag, last_modified)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if timeout:
+                cache.set(f'response:{etag}', response.get_data(as_text=True), timeout)
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Shared caches may store it, but must revalidate before reuse
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,196 @@
+"""Background transcoding of uploaded post videos.
+
+Uploaded videos are stored as sent, whatever their codec and bitrate. For
+each one create_post queues a transcode_job row; a worker then runs ffmpeg
+to produce an H.264/AAC MP4 capped at 720p with the index at the front
+(+faststart, so playback starts before the download ends) and a JPEG poster
+frame. Both go into the media store, and Post.video_url / Post.poster_url
+are set when the job is done.
+
+The queue is the transcode_job table, so jobs survive restarts and need no
+outside service. A worker claims a job with a conditional UPDATE, so any
+number of threads and processes can share the table; a job whose worker
+died is handed out again once its lease (VIDEO_JOB_LEASE seconds) runs out.
+Either way a job is tried at most MAX_ATTEMPTS times and then marked failed.
+
+Workers run as VIDEO_WORKERS threads in each web process (started on the
+first upload), or in a separate process with VIDEO_WORKERS=0 on the web
+side and:
+
+    python video_worker.py [threads]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from extensions import db
+from media_store import media_store
+from models.media import TranscodeJob
+from models.post import Post
+from versions import bump
+
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi'}
+MAX_ATTEMPTS = 3
+CLAIM_BATCH = 5
+
+def transcode(binary, source, workdir, timeout=None):
+    """Run ffmpeg; returns the paths of the streaming MP4 and the poster JPEG."""
+    video = os.path.join(workdir, 'video.mp4')
+    poster = os.path.join(workdir, 'poster.jpg')
+    scale = "scale='min(1280,iw)':-2"
+    subprocess.run([
+        binary, '-nostdin', '-y', '-loglevel', 'error', '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p', '-vf', scale,
+        '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', video,
+    ], check=True, capture_output=True, timeout=timeout)
+    # A frame one second in is usually past any fade from black; fall back to the first one
+    for offset in ('1', '0'):
+        subprocess.run([
+            binary, '-nostdin', '-y', '-loglevel', 'error', '-ss', offset, '-i', video,
+            '-frames:v', '1', '-q:v', '3', poster,
+        ], check=True, capture_output=True, timeout=timeout)
+        if os.path.exists(poster) and os.path.getsize(poster):
+            break
+    return video, poster
+
+class VideoQueue:
+    def __init__(self):
+        self.app = None
+        self.workers = 1
+        self.lease = 1800
+        self.poll_interval = 10.0
+        self.binary = 'ffmpeg'
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('VIDEO_WORKERS', self.workers)
+        self.lease = app.config.get('VIDEO_JOB_LEASE', self.lease)
+        self.poll_interval = app.config.get('VIDEO_POLL_INTERVAL', self.poll_interval)
+        self.binary = app.config.get('FFMPEG_BINARY', self.binary)
+        app.extensions['video_queue'] = self
+
+    def enqueue(self, post, source_key):
+        """Queue a transcode of an uploaded video; the caller commits, then calls notify()."""
+        db.session.add(TranscodeJob(post_id=post.id, source_key=source_key, status='queued', attempts=0))
+
+    def notify(self):
+        self.start(self.workers)
+        self._wake.set()
+
+    def start(self, workers):
+        # Started lazily, and again after a fork, so each process has its own pool
+        if not workers or (self._threads and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run, name=f'video-worker-{i}', daemon=True)
+                             for i in range(workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print('DEBUG: Video worker error:', e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def claim(self):
+        """Take the oldest queued job, or None. Also requeues jobs whose lease expired."""
+        now = datetime.utcnow()
+        expired = (TranscodeJob.status == 'running', TranscodeJob.locked_at < now - timedelta(seconds=self.lease))
+        # A job that keeps crashing or hanging its worker gives up like one that keeps failing. Its
+        # worker never committed, so there are no rendition references to release; the files it
+        # may have stored have no media_blob row and are removed by gc_media.py
+        TranscodeJob.query.filter(*expired, TranscodeJob.attempts >= MAX_ATTEMPTS).update({
+            TranscodeJob.status: 'failed',
+            TranscodeJob.error: 'Worker did not finish within VIDEO_JOB_LEASE',
+        }, synchronize_session=False)
+        TranscodeJob.query.filter(*expired, TranscodeJob.attempts < MAX_ATTEMPTS).update(
+            {TranscodeJob.status: 'queued'}, synchronize_session=False)
+        db.session.commit()
+        candidates = (db.session.query(TranscodeJob.id).filter(TranscodeJob.status == 'queued')
+                      .order_by(TranscodeJob.id).limit(CLAIM_BATCH).all())
+        for job_id, in candidates:
+            claimed = TranscodeJob.query.filter(
+                TranscodeJob.id == job_id, TranscodeJob.status == 'queued',
+            ).update({
+                TranscodeJob.status: 'running',
+                TranscodeJob.locked_at: now,
+                TranscodeJob.attempts: TranscodeJob.attempts + 1,
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return TranscodeJob.query.get(job_id)
+        return None
+
+    def run_once(self):
+        """Process one job if there is one. Returns whether a job was processed."""
+        with self.app.app_context():
+            job = self.claim()
+            if job is None:
+                return False
+            self.process(job)
+            return True
+
+    def process(self, job):
+        workdir = tempfile.mkdtemp(prefix='transcode-')
+        try:
+            source = media_store.local_path(job.source_key, workdir)
+            video, poster = transcode(self.binary, source, workdir, timeout=self.lease)
+            with open(video, 'rb') as f:
+                video_key = media_store.put(f, 'mp4')
+            with open(poster, 'rb') as f:
+                poster_key = media_store.put(f, 'jpg')
+        except Exception as e:
+            db.session.rollback()
+            if isinstance(e, subprocess.CalledProcessError):
+                e = e.stderr.decode(errors='replace').strip() or e
+            print('DEBUG: Transcode failed:', job, e)
+            job.status = 'failed' if job.attempts >= MAX_ATTEMPTS else 'queued'
+            job.error = str(e)[:512]
+            db.session.commit()
+            return
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        post = Post.query.get(job.post_id)
+        if post is None:
+            # Deleted while we were working
+            media_store.release(video_key)
+            media_store.release(poster_key)
+        else:
+            for url in (post.video_url, post.poster_url):
+                if url and url.startswith('/media/'):
+                    media_store.release(url[len('/media/'):])
+            post.video_url = f'/media/{video_key}'
+            post.poster_url = f'/media/{poster_key}'
+            bump('post')
+        job.status = 'done'
+        job.error = None
+        db.session.commit()
+
+video_queue = VideoQueue()
+
+if __name__ == "__main__":
+    import time
+    from app import create_app
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    app = create_app()
+    video_queue.start(workers)
+    print(f'Transcoding with {workers} workers')
+    while True:
+        time.sleep(3600)
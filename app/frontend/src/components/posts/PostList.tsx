@@ -18,9 +18,10 @@ interface Post {
   views_count?: number;
   title?: string;
   author?: {
-    avatar_url?: string;
-    username?: string;
-    name?: string;
+    id: number;
+    username: string;
+    title?: string | null;
+    avatar?: string | null;
   };
 }
 
@@ -137,6 +138,7 @@ export default function PostList() {
         page: reset ? 1 : page,
         per_page: 10,
         sort,
+        include: 'author',
       };
       if (debouncedSearch) params.search = debouncedSearch;
       if (category !== 'All') params.category = category;
@@ -259,9 +261,9 @@ export default function PostList() {
               <div className="flex items-center gap-2 sm:gap-3 min-w-0">
                 {/* Avatar (placeholder) */}
                 <div className="w-9 h-9 sm:w-8 sm:h-8 rounded-full bg-gray-200 flex items-center justify-center overflow-hidden">
-                  {post.author?.avatar_url ? (
+                  {post.author?.avatar ? (
                     <img
-                      src={post.author.avatar_url}
+                      src={`${API_BASE_URL}${post.author.avatar}?size=48`}
                       alt={post.author.username}
                       className="w-full h-full object-cover"
                     />
@@ -270,7 +272,7 @@ export default function PostList() {
                   )}
                 </div>
                 <div className="flex flex-col min-w-0">
-                  <span className="font-medium text-sm sm:text-base truncate max-w-[120px] sm:max-w-xs">{post.author?.name || 'User Name'}</span>
+                  <span className="font-medium text-sm sm:text-base truncate max-w-[120px] sm:max-w-xs">{post.author?.username || 'User Name'}</span>
                   <span className="text-xs text-gray-500 truncate">{formatDate(post.created_at)}</span>
                 </div>
               </div>
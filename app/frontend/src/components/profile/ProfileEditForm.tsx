@@ -43,6 +43,7 @@ const ProfileEditForm: React.FC<ProfileEditFormProps> = ({ profile, onSave, onCa
   // --- State for UI feedback ---
   const [touched, setTouched] = useState<any>({});
   const [avatarUrl, setAvatarUrl] = useState<string>(profile.avatar || '');
+  const [avatarError, setAvatarError] = useState<string | null>(null);
 
   // --- Validation logic ---
   // TODO: Extend validation for new fields as needed
@@ -77,6 +78,7 @@ const ProfileEditForm: React.FC<ProfileEditFormProps> = ({ profile, onSave, onCa
     setForm((f) => ({ ...f, avatar: file }));
     setTouched((t: any) => ({ ...t, avatar: true }));
     if (file) {
+      setAvatarError(null);
       try {
         let progress = 0;
         const interval = setInterval(() => {
@@ -88,7 +90,7 @@ const ProfileEditForm: React.FC<ProfileEditFormProps> = ({ profile, onSave, onCa
         setAvatarUrl(newAvatarUrl);
         setForm((f) => ({ ...f, avatar: null }));
       } catch (err) {
-        // Handle error
+        setAvatarError(err instanceof Error ? err.message : 'Failed to upload avatar');
       }
     }
   };
@@ -157,6 +159,7 @@ const ProfileEditForm: React.FC<ProfileEditFormProps> = ({ profile, onSave, onCa
             onChange={handleImageChange}
           />
           <span className="mt-2 text-gray-700 font-medium">Profile Photo</span>
+          {avatarError && <div className="text-red-500 text-sm mt-1">{avatarError}</div>}
         </div>
 
         {/* Basic Info */}
@@ -1,4 +1,6 @@
 const API_URL = `${import.meta.env.VITE_API_URL || 'http://localhost:5000'}/api/profile`;
+const AVATAR_POLL_INTERVAL_MS = 500;
+const AVATAR_POLL_TIMEOUT_MS = 60000;
 
 export async function fetchProfile() {
   const token = localStorage.getItem('token');
@@ -47,5 +49,21 @@ export async function uploadAvatar(file: File) {
     } catch {}
     throw new Error(errorMsg);
   }
-  return res.json();
+  let result = await res.json();
+  // The image is processed in the background; poll until the avatar is ready, for up to a minute
+  const deadline = Date.now() + AVATAR_POLL_TIMEOUT_MS;
+  while (result.status === 'pending') {
+    if (Date.now() > deadline) throw new Error('Avatar processing is taking too long, please try again');
+    await new Promise((resolve) => setTimeout(resolve, AVATAR_POLL_INTERVAL_MS));
+    const statusRes = await fetch(`${import.meta.env.VITE_API_URL || 'http://localhost:5000'}/api/profile/image/${result.job_id}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+      credentials: 'include',
+    });
+    if (!statusRes.ok) throw new Error('Failed to upload avatar');
+    result = await statusRes.json();
+  }
+  if (result.status === 'failed') throw new Error(result.error || 'Failed to upload avatar');
+  return result;
 } 
\ No newline at end of file